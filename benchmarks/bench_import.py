@@ -0,0 +1,126 @@
+"""Import time of the integration's modules.
+
+Imports each entry point Home Assistant loads (the integration itself,
+its config flow, services and platforms) in a fresh interpreter with
+``-X importtime`` and reports, as the median of several runs:
+
+* the cumulative import time of the module,
+* the part of it spent in the integration's own modules,
+* which heavy dependencies (httpx, the recorder, sqlalchemy) it pulled in.
+
+Home Assistant's own core modules are imported first and not counted, a
+running Home Assistant has those loaded already.
+
+Needs Home Assistant installed. Run from the repository root:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 15 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.greenely"
+
+MODULES = [
+    PACKAGE,
+    f"{PACKAGE}.config_flow",
+    f"{PACKAGE}.services",
+    f"{PACKAGE}.sensor",
+    f"{PACKAGE}.binary_sensor",
+    f"{PACKAGE}.diagnostics",
+]
+
+# Loaded by every Home Assistant before any integration
+PRELOAD = [
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.components.sensor",
+    "homeassistant.components.binary_sensor",
+]
+
+HEAVY = ["httpx", "homeassistant.components.recorder", "sqlalchemy"]
+
+
+def measure(python: str, module: str) -> dict:
+    """Import module once in a fresh interpreter, times in ms."""
+    code = "; ".join(f"import {name}" for name in PRELOAD) + (
+        f"; import sys; sys.stderr.write('-- start\\n'); import {module}"
+    )
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = result.stderr.split("-- start\n", 1)[1].splitlines()
+
+    total = own = 0
+    imported = set()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # The header line
+            continue
+        name = name.strip()
+        imported.add(name)
+        if name.startswith(PACKAGE):
+            own += int(self_us)
+        if name == module:
+            total = int(cumulative_us)
+    return {
+        "total_ms": total / 1000,
+        "own_ms": own / 1000,
+        "heavy": [
+            heavy
+            for heavy in HEAVY
+            if any(name == heavy or name.startswith(heavy + ".") for name in imported)
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+
+    print(f"{'module':<40} {'total ms':>9} {'own ms':>8}  heavy imports")
+    results = []
+    for module in args.modules:
+        runs = [measure(args.python, module) for _ in range(args.runs)]
+        result = {
+            "module": module,
+            "total_ms": statistics.median(run["total_ms"] for run in runs),
+            "own_ms": statistics.median(run["own_ms"] for run in runs),
+            "heavy": runs[-1]["heavy"],
+        }
+        print(
+            f"{module:<40} {result['total_ms']:>9.1f} {result['own_ms']:>8.1f}  "
+            f"{', '.join(result['heavy']) or '-'}"
+        )
+        results.append(result)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare the old strptime/strftime path with the shared parsing layer.
+
+Run from the repository root:
+
+    python benchmarks/bench_parsing.py
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import importlib.util
+from pathlib import Path
+import timeit
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_parsing():
+    """Import parsing.py directly so Home Assistant is not needed."""
+    spec = importlib.util.spec_from_file_location(
+        "greenely_parsing", ROOT / "custom_components" / "greenely" / "parsing.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_response(points: int, step: timedelta, value_key: str) -> dict:
+    start = datetime(2024, 1, 1)
+    return {
+        str(i): {
+            "localtime": (start + i * step).strftime("%Y-%m-%d %H:%M"),
+            value_key: 1000 + i,
+        }
+        for i in range(points)
+    }
+
+
+def old_hourly(response, date_format, time_format):
+    data = []
+    for k in response:
+        dateTime = datetime.strptime(response[k]["localtime"], "%Y-%m-%d %H:%M")
+        data.append(
+            {
+                "localtime": dateTime.strftime(date_format)
+                + " "
+                + dateTime.strftime(time_format),
+                "usage": response[k]["usage"] / 1000,
+            }
+        )
+    return data
+
+
+def new_hourly(parsing, formatter, response):
+    data = []
+    for dateTime, usage in parsing.parse_points(response, "usage"):
+        data.append(
+            {
+                "localtime": formatter.date(dateTime) + " " + formatter.time(dateTime),
+                "usage": usage / 1000,
+            }
+        )
+    return data
+
+
+def old_prices(response, date_format, time_format):
+    # Each point was parsed in the update loop and again in make_attribute
+    data = []
+    for d in response:
+        timestamp = datetime.strptime(response[d]["localtime"], "%Y-%m-%d %H:%M")
+        if timestamp.year:
+            dt_object = datetime.strptime(response[d]["localtime"], "%Y-%m-%d %H:%M")
+            data.append(
+                {
+                    "date": dt_object.strftime(date_format),
+                    "time": dt_object.strftime(time_format),
+                    "price": response[d]["price"],
+                }
+            )
+    return data
+
+
+def new_prices(parsing, formatter, response):
+    return [
+        {
+            "date": formatter.date(timestamp),
+            "time": formatter.time(timestamp),
+            "price": price,
+        }
+        for timestamp, price in parsing.parse_points(response, "price")
+    ]
+
+
+def report(name, old, new, number):
+    old_time = min(timeit.repeat(old, number=number, repeat=5)) / number
+    new_time = min(timeit.repeat(new, number=number, repeat=5)) / number
+    print(
+        f"{name:<32} old {old_time * 1000:8.2f} ms  "
+        f"new {new_time * 1000:8.2f} ms  x{old_time / new_time:.1f}"
+    )
+
+
+def main():
+    parsing = load_parsing()
+    date_format, time_format = "%b %d %Y", "%H:%M"
+
+    hourly = make_response(365 * 24, timedelta(hours=1), "usage")
+    report(
+        "hourly usage, 365 days",
+        lambda: old_hourly(hourly, date_format, time_format),
+        lambda: new_hourly(
+            parsing, parsing.DateTimeFormatter(date_format, time_format), hourly
+        ),
+        number=5,
+    )
+
+    prices = make_response(3 * 96, timedelta(minutes=15), "price")
+    report(
+        "spot prices, 3 days quarter-hour",
+        lambda: old_prices(prices, date_format, time_format),
+        lambda: new_prices(
+            parsing, parsing.DateTimeFormatter(date_format, time_format), prices
+        ),
+        number=200,
+    )
+
+
+if __name__ == "__main__":
+    main()
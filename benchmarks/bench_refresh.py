@@ -0,0 +1,225 @@
+"""End-to-end refresh benchmarks against the local Greenely mock API.
+
+Runs the facility coordinators of one login against mock_server.py and
+reports, per scenario of usage_days, spot price resolution and facility
+count:
+
+* refresh latency of a cold (empty cache) and a warm cycle,
+* requests sent per cycle, how many of them were answered with 304 and
+  the bytes transferred,
+* CPU time spent building the sensor attributes (make_attributes,
+  make_attribute, make_day_attribute),
+* size of the serialized sensor attributes.
+
+Needs Home Assistant installed. Run from the repository root:
+
+    python benchmarks/bench_refresh.py
+    python benchmarks/bench_refresh.py --latency 0.05 --failure-rate 0.05 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import cProfile
+from itertools import product
+import json
+from pathlib import Path
+import pstats
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.greenely import sensor  # noqa: E402
+from custom_components.greenely.api import GreenelyApi  # noqa: E402
+from custom_components.greenely.const import (  # noqa: E402
+    GREENELY_DAILY_PRODUCED_ELECTRICITY,
+    GREENELY_DAILY_USAGE,
+    GREENELY_HOURLY_OFFSET_DAYS,
+    GREENELY_HOURLY_USAGE,
+    GREENELY_PRICES,
+    GREENELY_PRODUCED_ELECTRICITY_DAYS,
+    GREENELY_SPOT_PRICE_RESOLUTION,
+    GREENELY_USAGE_DAYS,
+)
+from custom_components.greenely.coordinator import (  # noqa: E402
+    GreenelyDataUpdateCoordinator,
+    GreenelyFacilities,
+)
+from custom_components.greenely.parsing import DateTimeFormatter  # noqa: E402
+from mock_server import MockGreenelyServer  # noqa: E402
+
+ATTRIBUTE_FUNCTIONS = {"make_attributes", "make_attribute", "make_day_attribute"}
+
+
+def make_entry(usage_days: int, resolution: str) -> SimpleNamespace:
+    """The parts of a config entry the coordinator reads."""
+    return SimpleNamespace(
+        entry_id="benchmark",
+        data={GREENELY_DAILY_USAGE: True, GREENELY_PRICES: True},
+        options={
+            GREENELY_HOURLY_USAGE: True,
+            GREENELY_DAILY_PRODUCED_ELECTRICITY: True,
+            GREENELY_USAGE_DAYS: usage_days,
+            GREENELY_PRODUCED_ELECTRICITY_DAYS: usage_days,
+            GREENELY_HOURLY_OFFSET_DAYS: usage_days,
+            GREENELY_SPOT_PRICE_RESOLUTION: resolution,
+        },
+    )
+
+
+def build_sensors(coordinator, facility_id: str) -> list:
+    formatter = DateTimeFormatter("%b %d %Y", "%H:%M")
+    return [
+        sensor.GreenelyDailyUsageSensor("usage", coordinator, facility_id, formatter),
+        sensor.GreenelyHourlyUsageSensor("hourly", coordinator, facility_id, formatter),
+        sensor.GreenelyPricesSensor(
+            "prices", coordinator, facility_id, formatter, False
+        ),
+        sensor.GreenelyDailyProducedElecticitySensor(
+            "produced", coordinator, facility_id, formatter
+        ),
+    ]
+
+
+def attribute_cpu(coordinators) -> tuple[float, int]:
+    """Profile building every sensor, return attribute CPU time and bytes."""
+    profile = cProfile.Profile()
+    profile.enable()
+    sensors = [
+        entity
+        for coordinator in coordinators
+        for entity in build_sensors(coordinator, coordinator.api.facility_id)
+    ]
+    profile.disable()
+
+    cpu = 0.0
+    for (filename, _, function), row in pstats.Stats(profile).stats.items():
+        if function in ATTRIBUTE_FUNCTIONS and filename.endswith("sensor.py"):
+            # Cumulative time, these functions do not call each other
+            cpu += row[3]
+    size = sum(
+        len(json.dumps(entity.extra_state_attributes, default=str))
+        for entity in sensors
+    )
+    return cpu, size
+
+
+async def run_scenario(args, usage_days: int, resolution: str, facilities: int):
+    server = MockGreenelyServer(
+        facilities=facilities,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        retry_after=args.retry_after,
+        etag=not args.no_etag,
+        compress=not args.no_compress,
+    ).start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        client = httpx.AsyncClient(timeout=30)
+        try:
+            api = GreenelyApi(
+                "bench@example.com", "secret", client, base_url=server.base_url
+            )
+            api.set_facility_id(server.facilities[0]["id"])
+            entry = make_entry(usage_days, resolution)
+            coordinators = [GreenelyDataUpdateCoordinator(hass, entry, api)] + [
+                GreenelyDataUpdateCoordinator(
+                    hass, entry, api.for_facility(facility["id"])
+                )
+                for facility in server.facilities[1:]
+            ]
+            group = GreenelyFacilities(coordinators)
+
+            cycles = []
+            for _ in range(args.cycles):
+                server.reset_stats()
+                start = time.perf_counter()
+                await group.async_refresh()
+                cycles.append(
+                    {
+                        "latency_ms": (time.perf_counter() - start) * 1000,
+                        "requests": sum(server.requests.values()),
+                        "not_modified": sum(server.not_modified.values()),
+                        "bytes": server.bytes_sent,
+                        "failed": sum(
+                            not coordinator.last_update_success
+                            for coordinator in coordinators
+                        ),
+                    }
+                )
+            cpu, size = attribute_cpu(coordinators)
+        finally:
+            await client.aclose()
+            server.stop()
+            await hass.async_stop(force=True)
+
+    return {
+        "usage_days": usage_days,
+        "resolution": resolution,
+        "facilities": facilities,
+        "cold": cycles[0],
+        "warm": cycles[1:],
+        "attribute_cpu_ms": cpu * 1000,
+        "attribute_bytes": size,
+    }
+
+
+def print_result(result) -> None:
+    cold = result["cold"]
+    warm = result["warm"][-1] if result["warm"] else cold
+    print(
+        f"{result['usage_days']:>5} {result['resolution']:>15} "
+        f"{result['facilities']:>4} "
+        f"{cold['latency_ms']:>9.1f} {cold['requests']:>5} "
+        f"{warm['latency_ms']:>9.1f} {warm['requests']:>5} "
+        f"{warm['not_modified']:>5} {cold['bytes']:>9} {warm['bytes']:>9} "
+        f"{result['attribute_cpu_ms']:>9.2f} {result['attribute_bytes']:>10}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usage-days", type=int, nargs="+", default=[10, 30, 90])
+    parser.add_argument("--resolution", nargs="+", default=["hourly", "quarter_hourly"])
+    parser.add_argument("--facilities", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=None)
+    parser.add_argument("--no-etag", action="store_true", help="mock sends no ETag")
+    parser.add_argument("--no-compress", action="store_true", help="mock sends no gzip")
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+
+    print(
+        f"{'days':>5} {'resolution':>15} {'fac':>4} "
+        f"{'cold ms':>9} {'req':>5} {'warm ms':>9} {'req':>5} "
+        f"{'304':>5} {'cold B':>9} {'warm B':>9} "
+        f"{'attr ms':>9} {'attr bytes':>10}"
+    )
+    results = []
+    for usage_days, resolution, facilities in product(
+        args.usage_days, args.resolution, args.facilities
+    ):
+        result = await run_scenario(args, usage_days, resolution, facilities)
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
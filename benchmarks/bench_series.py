@@ -0,0 +1,162 @@
+"""Memory and update CPU of the series representations the sensors used.
+
+Compares, for a year of hourly usage per facility:
+
+* dicts: the list of {"localtime", "usage"} dicts the sensors kept,
+* points: the list of (datetime, value) tuples of the parsing layer,
+* series: the array backed Series now held by the coordinator data.
+
+Reported are the memory each representation holds (tracemalloc), the
+time to build it from an API payload (parsing included), to find the
+state of a given hour and to render the legacy attribute list from it.
+
+Run from the repository root:
+
+    python benchmarks/bench_series.py
+    python benchmarks/bench_series.py --days 365 --facilities 4
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta
+import importlib.util
+from pathlib import Path
+import sys
+import timeit
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load(name: str):
+    """Import a module of the integration directly, without Home Assistant."""
+    spec = importlib.util.spec_from_file_location(
+        f"greenely_{name}", ROOT / "custom_components" / "greenely" / f"{name}.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_response(hours: int) -> dict:
+    start = datetime(2024, 1, 1)
+    return {
+        str(i): {
+            "localtime": (start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M"),
+            "usage": 500 + (i * 37) % 900,
+        }
+        for i in range(hours)
+    }
+
+
+def as_dicts(formatter, points):
+    return [
+        {
+            "localtime": formatter.date(moment) + " " + formatter.time(moment),
+            "usage": usage / 1000,
+        }
+        for moment, usage in points
+    ]
+
+
+def series_dicts(formatter, series):
+    """The same list, rendered from the series the way the sensor does."""
+    return [
+        {"localtime": day + " " + clock, "usage": usage / 1000}
+        for (day, clock), usage in zip(series.labels(formatter), series.to_list())
+    ]
+
+
+def held_bytes(build) -> tuple[int, object]:
+    """Bytes still allocated by what build returns."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size, held
+
+
+def best(function, number: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--facilities", type=int, default=1)
+    args = parser.parse_args()
+
+    parsing = load("parsing")
+    series_module = load("series")
+    Series = series_module.Series
+    formatter = parsing.DateTimeFormatter("%b %d %Y", "%H:%M")
+
+    hours = args.days * 24
+    payloads = [make_response(hours) for _ in range(args.facilities)]
+    lookup = datetime(2024, 1, 1) + timedelta(hours=hours - 30, minutes=20)
+
+    def build_dicts():
+        return [as_dicts(formatter, parsing.parse_points(p, "usage")) for p in payloads]
+
+    def build_points():
+        return [parsing.parse_points(p, "usage") for p in payloads]
+
+    def build_series():
+        return [Series.from_response(p, "usage", series_module.HOUR) for p in payloads]
+
+    dict_bytes, dicts = held_bytes(build_dicts)
+    point_bytes, points = held_bytes(build_points)
+    series_bytes, series = held_bytes(build_series)
+    del dicts
+
+    def point_state():
+        hour = lookup.replace(minute=0)
+        for moment, value in points[0]:
+            if moment == hour:
+                return value
+
+    rows = [
+        (
+            "dicts",
+            dict_bytes,
+            best(build_dicts, 3),
+            best(point_state, 20),
+            best(lambda: [as_dicts(formatter, p) for p in points], 3),
+        ),
+        (
+            "points",
+            point_bytes,
+            best(build_points, 3),
+            best(point_state, 20),
+            best(lambda: [as_dicts(formatter, p) for p in points], 3),
+        ),
+        (
+            "series",
+            series_bytes,
+            best(build_series, 3),
+            best(lambda: series[0].value_at(lookup), 20000),
+            best(lambda: [series_dicts(formatter, s) for s in series], 3),
+        ),
+    ]
+
+    print(
+        f"{args.days} days of hourly values, {args.facilities} facilities "
+        f"({hours * args.facilities} points)"
+    )
+    print(
+        f"{'representation':<15} {'held kB':>10} {'build ms':>10} "
+        f"{'state us':>10} {'render ms':>10}"
+    )
+    for name, size, build, state, render in rows:
+        print(
+            f"{name:<15} {size / 1024:>10.0f} {build * 1000:>10.2f} "
+            f"{state * 1e6:>10.2f} {render * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Local stand-in for the Greenely API used by the benchmarks.
+
+Serves the endpoints the integration calls with payloads shaped like the
+real ones, generated deterministically from the requested range:
+
+    POST /v1/login
+    GET  /v1/checkauth
+    GET  /v1/facilities/
+    GET  /v1/facilities/<id>/consumption
+    GET  /v1/facilities/<id>/spot-price
+    GET  /v1/facilities/<id>/produced-electricity
+
+Responses carry an ETag and are answered with 304 when it matches, and
+are gzip compressed when the client accepts it. Latency and failures can
+be injected. Run it on its own with
+
+    python benchmarks/mock_server.py --port 8765 --latency 0.05 --failure-rate 0.1
+
+or start it in-process with MockGreenelyServer (see bench_refresh.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+from collections import Counter
+from datetime import datetime, timedelta
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+STEPS = {
+    "daily": timedelta(days=1),
+    "hourly": timedelta(hours=1),
+    "quarter_hourly": timedelta(minutes=15),
+}
+
+
+def _b64(data: dict) -> str:
+    raw = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+    return raw.rstrip("=")
+
+
+def make_jwt(lifetime: float = 3600) -> str:
+    claims = {"exp": int(time.time() + lifetime), "sub": "benchmark"}
+    return _b64({"alg": "HS256", "typ": "JWT"}) + "." + _b64(claims) + ".signature"
+
+
+def _parse_day(value: str) -> datetime:
+    # The integration sends both zero padded and unpadded days
+    year, month, day = (int(part) for part in value.split("-"))
+    return datetime(year, month, day)
+
+
+def _usage(moment: datetime, hours: float) -> int:
+    """Wh used in a slot, with a daily curve and some day to day variation."""
+    curve = 600 + 400 * math.sin((moment.hour - 6) / 24 * 2 * math.pi)
+    return round(curve * (1 + (moment.toordinal() % 7) / 20) * hours)
+
+
+def _price(moment: datetime) -> int:
+    """Spot price in the API's unit, 1/100000 SEK per kWh."""
+    curve = 80 + 60 * math.sin(
+        (moment.hour + moment.minute / 60 - 8) / 24 * 2 * math.pi
+    )
+    return round(curve * 1000 * (1 + (moment.toordinal() % 5) / 10))
+
+
+def _series(start, end, step, value, now, only_past=True):
+    data = {}
+    moment = start
+    while moment < end:
+        known = moment + step <= now if only_past else True
+        data[str(int(moment.timestamp()))] = {
+            "localtime": moment.strftime("%Y-%m-%d %H:%M"),
+            **value(moment, known),
+        }
+        moment += step
+    return data
+
+
+class MockGreenelyServer:
+    """Threaded mock API with request counting and fault injection."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        facilities: int = 1,
+        primary: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        retry_after: int | None = None,
+        seed: int = 1,
+        etag: bool = True,
+        compress: bool = True,
+    ) -> None:
+        self.facilities = [
+            {
+                "id": 1000 + index,
+                "street": f"Benchmark street {index + 1}",
+                "zip_code": "11122",
+                "city": "Stockholm",
+                "is_primary": index == primary,
+            }
+            for index in range(facilities)
+        ]
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.etag = etag
+        self.compress = compress
+        self.requests: Counter[str] = Counter()
+        self.not_modified: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.not_modified.clear()
+            self.bytes_sent = 0
+
+    def start(self) -> MockGreenelyServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> MockGreenelyServer:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def _count(self, endpoint: str, size: int, not_modified: bool) -> None:
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.not_modified[endpoint] += not_modified
+            self.bytes_sent += size
+
+    def route(self, method: str, path: str, query: dict[str, str]):
+        """Return (endpoint name, status, payload) for a request."""
+        parts = [part for part in path.split("/") if part]
+        if method == "POST" and parts == ["v1", "login"]:
+            return "login", 200, {"jwt": make_jwt()}
+        if method != "GET":
+            return "unknown", 405, {"error": "method not allowed"}
+        if parts == ["v1", "checkauth"]:
+            return "checkauth", 200, {"status": "ok"}
+        if parts == ["v1", "facilities"]:
+            return "facilities", 200, {"data": self.facilities}
+        if len(parts) != 4 or parts[:2] != ["v1", "facilities"]:
+            return "unknown", 404, {"error": "not found"}
+
+        facility, endpoint = parts[2], parts[3]
+        if not any(str(f["id"]) == facility for f in self.facilities):
+            return endpoint, 404, {"error": "unknown facility"}
+        start = _parse_day(query["from"])
+        end = _parse_day(query["to"])
+        step = STEPS.get(query.get("resolution", "daily"))
+        if step is None:
+            return endpoint, 400, {"error": "unknown resolution"}
+        now = datetime.now()
+        hours = step.total_seconds() / 3600
+
+        if endpoint == "consumption":
+            if query.get("unit") == "currency":
+                value = lambda moment, known: {
+                    "cost": (
+                        _usage(moment, hours) * _price(moment) // 1000
+                        if known
+                        else None
+                    )
+                }
+            else:
+                value = lambda moment, known: {
+                    "usage": _usage(moment, hours) if known else None
+                }
+            return endpoint, 200, {"data": _series(start, end, step, value, now)}
+        if endpoint == "produced-electricity":
+            value = lambda moment, known: {
+                "value": max(_usage(moment, hours) - 500 * hours, 0) if known else None
+            }
+            return endpoint, 200, {"data": _series(start, end, step, value, now)}
+        if endpoint == "spot-price":
+            # Tomorrow's prices are published in the early afternoon
+            published = datetime.combine(now.date(), datetime.min.time()) + (
+                timedelta(days=2) if now.hour >= 13 else timedelta(days=1)
+            )
+            value = lambda moment, known: {
+                "price": _price(moment) if moment < published else None
+            }
+            return (
+                endpoint,
+                200,
+                {"data": _series(start, end, step, value, now, only_past=False)},
+            )
+        return endpoint, 404, {"error": "not found"}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, method: str) -> None:
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+                endpoint, status, payload = server.route(method, url.path, query)
+                headers = {}
+                if server._should_fail():
+                    status, payload = 503, {"error": "injected failure"}
+                    if server.retry_after is not None:
+                        headers["Retry-After"] = str(server.retry_after)
+                elif endpoint not in ("login", "unknown") and not self.headers.get(
+                    "Authorization", ""
+                ).startswith("JWT "):
+                    status, payload = 401, {"error": "unauthorized"}
+
+                body = json.dumps(payload).encode()
+                if status == 200 and server.etag:
+                    etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                    headers["ETag"] = etag
+                    if self.headers.get("If-None-Match") == etag:
+                        status, body = 304, b""
+                if body and server.compress:
+                    if "gzip" in self.headers.get("Accept-Encoding", ""):
+                        body = gzip.compress(body, compresslevel=6)
+                        headers["Content-Encoding"] = "gzip"
+                server._count(endpoint, len(body), status == 304)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                self._respond("GET")
+
+            def do_POST(self) -> None:
+                self._respond("POST")
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--facilities", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=None)
+    parser.add_argument("--no-etag", action="store_true")
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args()
+
+    server = MockGreenelyServer(
+        args.host,
+        args.port,
+        facilities=args.facilities,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        retry_after=args.retry_after,
+        etag=not args.no_etag,
+        compress=not args.no_compress,
+    )
+    print(f"Serving the Greenely mock API on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
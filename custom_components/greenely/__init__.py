@@ -2,17 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+import importlib
+from typing import TYPE_CHECKING
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_EMAIL, CONF_PASSWORD, Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.typing import ConfigType
 
 from .services import async_setup_services
-from .api import GreenelyApi
-from .const import GREENELY_FACILITY_ID
+from .const import (
+    DOMAIN,
+    GREENELY_FACILITY_ID,
+    GREENELY_FACILITY_IDS,
+    GREENELY_REQUEST_BUDGET,
+    RATE_LIMIT_BUDGET,
+    SCAN_INTERVAL,
+    SETUP_TIMEOUT,
+)
 
-PLATFORMS: list[Platform] = [Platform.SENSOR]
+if TYPE_CHECKING:
+    from .api import GreenelyApi
+    from .coordinator import GreenelyDataUpdateCoordinator, GreenelyFacilities
+
+PLATFORMS: list[Platform] = [Platform.BINARY_SENSOR, Platform.SENSOR]
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 
 type GreenelyConfigEntry = ConfigEntry[GreenelyData]
@@ -24,31 +44,151 @@ class GreenelyData:
 
     api: GreenelyApi
     facilitiyId: int
+    coordinator: GreenelyDataUpdateCoordinator
+    coordinators: list[GreenelyDataUpdateCoordinator]
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Greenely services, once for all config entries."""
+    await async_setup_services(hass)
+    return True
+
+
+def _import_runtime_modules() -> None:
+    """Import the api and coordinator, which pull in httpx, off the loop.
+
+    The package is imported before the config flow and the services, so
+    they are only loaded once an entry is set up.
+    """
+    for name in ("api", "coordinator", "snapshot"):
+        importlib.import_module(f".{name}", __package__)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: GreenelyConfigEntry) -> bool:
     """Set up Greenely from a config entry."""
+    await hass.async_add_import_executor_job(_import_runtime_modules)
+    import httpx
+
+    from .api import GreenelyApi, async_get_client, get_rate_limiter
+    from .coordinator import GreenelyDataUpdateCoordinator, GreenelyFacilities
+    from .snapshot import GreenelySnapshot
 
     email = entry.data[CONF_EMAIL]
     password = entry.data[CONF_PASSWORD]
 
-    api = GreenelyApi(email, password)
+    limiter = get_rate_limiter(hass, email)
+    limiter.configure(entry.options.get(GREENELY_REQUEST_BUDGET, RATE_LIMIT_BUDGET))
+    api = GreenelyApi(email, password, await async_get_client(hass), limiter=limiter)
 
     entry.async_on_unload(entry.add_update_listener(async_update_options))
 
-    if api.check_auth():
-        facilityId = (
-            api.get_facility_id()
-            if entry.data.get(GREENELY_FACILITY_ID, "") == ""
-            else entry.data[GREENELY_FACILITY_ID]
+    if entry.options.get(GREENELY_FACILITY_ID):
+        # The facility chosen in the options, otherwise the primary one
+        api.set_facility_id(entry.options[GREENELY_FACILITY_ID])
+
+    snapshot = GreenelySnapshot(hass, entry.entry_id)
+    stored = await snapshot.async_load()
+    facilityIds = _configured_facility_ids(entry)
+    if stored is not None and facilityIds is None:
+        facilityIds = stored["facilities"]
+
+    if (
+        stored is not None
+        and entry.options.get(GREENELY_FACILITY_ID)
+        and facilityIds is not None
+    ):
+        # Start from the last known data, logging in is left to the refresh
+        authenticated = True
+        facilityId = entry.data.get(GREENELY_FACILITY_ID) or api.facility_id
+    else:
+        try:
+            async with asyncio.timeout(SETUP_TIMEOUT):
+                authenticated = await api.ensure_auth()
+                facilityId = (
+                    await api.get_facility_id()
+                    if authenticated and entry.data.get(GREENELY_FACILITY_ID, "") == ""
+                    else entry.data.get(GREENELY_FACILITY_ID)
+                )
+                if authenticated and facilityIds is None:
+                    facilities = await api.get_facility_ids() or []
+                    facilityIds = [str(facility["id"]) for facility in facilities]
+        except (TimeoutError, httpx.HTTPError) as err:
+            raise ConfigEntryNotReady(f"Unable to reach Greenely: {err}") from err
+        stored = None
+
+    if authenticated:
+        facilityIds = [
+            facility_id
+            for facility_id in dict.fromkeys(facilityIds or [])
+            if facility_id != str(api.facility_id)
+        ]
+        coordinators = [GreenelyDataUpdateCoordinator(hass, entry, api)] + [
+            GreenelyDataUpdateCoordinator(hass, entry, api.for_facility(facility_id))
+            for facility_id in facilityIds
+        ]
+        facilities = GreenelyFacilities(coordinators, snapshot)
+        restored = stored["data"] if stored is not None else {}
+        if all(str(c.api.facility_id) in restored for c in coordinators):
+            for coordinator in coordinators:
+                coordinator.restore(restored[str(coordinator.api.facility_id)])
+            entry.async_create_background_task(
+                hass,
+                _async_deferred_refresh(hass, entry, facilities),
+                f"{DOMAIN} first refresh",
+            )
+        else:
+            await facilities.async_config_entry_first_refresh()
+        entry.async_on_unload(
+            async_track_time_interval(hass, facilities.async_refresh, SCAN_INTERVAL)
         )
-        entry.runtime_data = GreenelyData(api, facilityId)
+        entry.runtime_data = GreenelyData(
+            api, facilityId, coordinators[0], coordinators
+        )
+        for coordinator in coordinators:
+            entry.async_create_background_task(
+                hass,
+                coordinator.backfill.async_resume(),
+                f"{DOMAIN} backfill {coordinator.api.facility_id}",
+            )
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    await async_setup_services(hass)
     return True
 
 
+def _configured_facility_ids(entry: GreenelyConfigEntry) -> list[str] | None:
+    """Return the extra facilities to track, None when all of them are."""
+    option = str(entry.options.get(GREENELY_FACILITY_IDS, "")).strip()
+    if option == "all":
+        return None
+    return [part.strip() for part in option.split(",") if part.strip()]
+
+
+async def _async_deferred_refresh(
+    hass: HomeAssistant, entry: GreenelyConfigEntry, facilities: GreenelyFacilities
+) -> None:
+    """Refresh restored coordinators, reload if the facilities changed."""
+    import httpx
+
+    await facilities.async_refresh()
+    if _configured_facility_ids(entry) is not None:
+        return
+    api = facilities.coordinators[0].api
+    try:
+        found = await api.get_facility_ids() or []
+    except httpx.HTTPError:
+        return
+    known = {
+        str(coordinator.api.facility_id) for coordinator in facilities.coordinators
+    }
+    facilityIds = [str(facility["id"]) for facility in found]
+    if facilityIds and set(facilityIds) != known:
+        # The reload starts from the stored list, it has to be the new one
+        await facilities.snapshot.async_save_facilities(
+            facilities.coordinators, facilityIds
+        )
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+
+
 async def async_update_options(hass: HomeAssistant, entry: GreenelyConfigEntry):
     await hass.config_entries.async_reload(entry.entry_id)
 
@@ -1,36 +1,324 @@
 """Greenely API"""
 
+from __future__ import annotations
+
+import asyncio
+import base64
 from datetime import datetime, timedelta
 import json
 import logging
+import time
 
 import httpx
 
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .const import (
+    API_BASE_URL,
+    API_CONNECT_TIMEOUT,
+    API_KEEPALIVE_EXPIRY,
+    API_MAX_CONNECTIONS,
+    API_TIMEOUT,
+    DATA_CLIENT,
+    DATA_RATE_LIMITERS,
+    PRIORITY_BACKFILL,
+    PRIORITY_DEFAULT,
+    PRIORITY_PRICES,
+    RATE_LIMIT_BUDGET,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF_MAX,
+    TOKEN_REFRESH_MARGIN,
+)
+from .httpcache import ResponseCache, accept_encoding
+from .metrics import ApiMetrics
+from .ratelimit import RateLimiter
+from .resilience import (
+    RETRY_STATUS_CODES,
+    CircuitBreaker,
+    GreenelyApiError,
+    backoff_delay,
+    retry_after,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
+def _create_client() -> httpx.AsyncClient:
+    """Create the pooled client, loading the SSL context off the event loop."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=API_MAX_CONNECTIONS,
+            max_keepalive_connections=API_MAX_CONNECTIONS,
+            keepalive_expiry=API_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def async_get_client(hass: HomeAssistant) -> httpx.AsyncClient:
+    """Return the long-lived client shared by every Greenely entry and service."""
+    client = hass.data.get(DATA_CLIENT)
+    if client is not None:
+        return client
+
+    client = await hass.async_add_executor_job(_create_client)
+    if DATA_CLIENT in hass.data:
+        # Another caller won the race while the client was being built
+        await client.aclose()
+        return hass.data[DATA_CLIENT]
+
+    hass.data[DATA_CLIENT] = client
+
+    async def _async_close_client(event: Event) -> None:
+        await client.aclose()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_client)
+    return client
+
+
+@callback
+def get_rate_limiter(hass: HomeAssistant, email: str) -> RateLimiter:
+    """Return the request budget shared by every entry and service of an account."""
+    limiters: dict[str, RateLimiter] = hass.data.setdefault(DATA_RATE_LIMITERS, {})
+    key = email.strip().lower()
+    if key not in limiters:
+        limiters[key] = RateLimiter(RATE_LIMIT_BUDGET)
+    return limiters[key]
+
+
+def _decode_jwt_expiry(token: str) -> float | None:
+    """Return the exp claim of a JWT as a unix timestamp, if it has one."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class GreenelySession:
+    """Login state of an account, shared by the api of each of its facilities."""
+
+    __slots__ = (
+        "jwt",
+        "refresh_at",
+        "primary_facility_id",
+        "lock",
+        "breaker",
+        "metrics",
+        "responses",
+    )
+
+    def __init__(self) -> None:
+        self.jwt = ""
+        self.primary_facility_id: str | None = None
+        self.refresh_at: float | None = None
+        self.lock = asyncio.Lock()
+        self.breaker = CircuitBreaker()
+        self.metrics = ApiMetrics()
+        self.responses = ResponseCache()
+
+
 class GreenelyApi:
-    def __init__(self, email, password):
-        self._jwt = ""
-        self._url_check_auth = "https://api2.greenely.com/v1/checkauth"
-        self._url_login = "https://api2.greenely.com/v1/login"
-        self._url_data = "https://api2.greenely.com/v3/data/"
-        self._url_facilities_base = "https://api2.greenely.com/v1/facilities/"
+    def __init__(
+        self,
+        email,
+        password,
+        client: httpx.AsyncClient,
+        session: GreenelySession | None = None,
+        limiter: RateLimiter | None = None,
+        base_url: str = API_BASE_URL,
+    ):
+        self._session = session or GreenelySession()
+        self._limiter = limiter
+        self._base_url = base_url
+        self._url_check_auth = base_url + "/v1/checkauth"
+        self._url_login = base_url + "/v1/login"
+        self._url_data = base_url + "/v3/data/"
+        self._url_facilities_base = base_url + "/v1/facilities/"
         self._headers = {
             "Accept-Language": "sv-SE",
+            "Accept-Encoding": accept_encoding(),
             "User-Agent": "Android 2 111",
             "Content-Type": "application/json; charset=utf-8",
-            "Authorization": self._jwt,
         }
         self._email = email
         self._password = password
         self._facility_id = "primary"
+        self._client = client
+
+    def token_valid(self) -> bool:
+        """Return whether the current jwt is usable without asking the server."""
+        if not self._session.jwt:
+            return False
+        if self._session.refresh_at is None:
+            # Unknown lifetime, rely on a 401 from a data call instead
+            return True
+        return time.time() < self._session.refresh_at
+
+    def _auth_headers(self) -> dict[str, str]:
+        return {**self._headers, "Authorization": self._session.jwt}
+
+    async def ensure_auth(self) -> bool:
+        """Log in if we have no jwt or it is about to expire.
+
+        Concurrent callers share a single login; whoever gets the lock
+        first refreshes the token and the rest reuse it. The primary
+        facility is looked up the same way, once per session.
+        """
+        session = self._session
+        if not self.token_valid():
+            async with session.lock:
+                if not self.token_valid() and not await self.login():
+                    return False
+        if self._facility_id == "primary":
+            async with session.lock:
+                if session.primary_facility_id is None:
+                    session.primary_facility_id = await self.get_facility_id()
+            self._facility_id = session.primary_facility_id
+        return True
+
+    async def _relogin(self, rejected_jwt: str) -> bool:
+        """Replace a jwt the server rejected, unless someone already did."""
+        async with self._session.lock:
+            if self._session.jwt != rejected_jwt:
+                return True
+            return await self.login()
+
+    @property
+    def limiter(self) -> RateLimiter | None:
+        return self._limiter
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._session.breaker
+
+    @property
+    def metrics(self) -> ApiMetrics:
+        return self._session.metrics
+
+    async def _request(
+        self, method, url, endpoint, priority=PRIORITY_DEFAULT, **kwargs
+    ) -> httpx.Response:
+        """Send a request, retrying transient failures of the endpoint.
+
+        Transport errors, 429 and 5xx responses are retried with jittered
+        exponential backoff, or after the Retry-After the server asks for
+        when it is short enough. The final failure counts against the
+        circuit breaker and raises GreenelyApiError.
+        """
+        breaker = self._session.breaker
+        breaker.before_call()
+        metrics = self._session.metrics.endpoint(endpoint)
+        attempts = RETRY_ATTEMPTS.get(endpoint, 1)
+        for attempt in range(attempts):
+            if self._limiter is not None:
+                await self._limiter.acquire(priority)
+            start = time.monotonic()
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as err:
+                metrics.observe(time.monotonic() - start, 0, True)
+                error = f"{type(err).__name__} {err}"
+                delay = None
+            else:
+                # What was transferred, before decompressing
+                metrics.observe(
+                    time.monotonic() - start,
+                    response.num_bytes_downloaded,
+                    response.is_error,
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    breaker.success()
+                    return response
+                error = f"status {response.status_code}"
+                delay = retry_after(response)
+
+            if attempt + 1 == attempts or (
+                delay is not None and delay > RETRY_BACKOFF_MAX
+            ):
+                breaker.failure(delay)
+                raise GreenelyApiError(f"Request to {endpoint} failed: {error}")
+            if delay is None:
+                delay = backoff_delay(attempt)
+            metrics.retries += 1
+            _LOGGER.debug(
+                "Request to %s failed (%s), retrying in %.1f s", endpoint, error, delay
+            )
+            await asyncio.sleep(delay)
+
+    async def _get(
+        self, url, endpoint, priority=PRIORITY_DEFAULT, headers=None
+    ) -> httpx.Response:
+        """GET an authenticated endpoint, logging in again once on a 401."""
+        headers = headers or {}
+        await self.ensure_auth()
+        jwt = self._session.jwt
+        response = await self._request(
+            "GET", url, endpoint, priority, headers={**self._auth_headers(), **headers}
+        )
+        if response.status_code == httpx.codes.UNAUTHORIZED:
+            _LOGGER.debug("jwt was rejected, logging in again")
+            if await self._relogin(jwt):
+                response = await self._request(
+                    "GET",
+                    url,
+                    endpoint,
+                    priority,
+                    headers={**self._auth_headers(), **headers},
+                )
+        return response
+
+    async def _get_json(self, url, endpoint, error, priority=PRIORITY_DEFAULT):
+        """GET a json endpoint, conditionally unless it is a backfill.
+
+        An unchanged response returns the same payload object as the
+        previous one, callers must not modify it.
+        """
+        if priority == PRIORITY_BACKFILL:
+            # Every chunk is requested once, caching would only hold memory
+            response = await self._get(url, endpoint, priority, {})
+            if response.status_code != httpx.codes.ok:
+                raise GreenelyApiError(f"{error}: {response.status_code}")
+            return response.json()
+
+        responses = self._session.responses
+        response = await self._get(url, endpoint, priority, responses.validators(url))
+        if response.status_code not in (httpx.codes.ok, httpx.codes.NOT_MODIFIED):
+            raise GreenelyApiError(f"{error}: {response.status_code}")
+        payload, unchanged = responses.resolve(url, response)
+        if unchanged:
+            self._session.metrics.endpoint(endpoint).unchanged += 1
+        return payload
+
+    @property
+    def facility_id(self) -> str:
+        return self._facility_id
 
     def set_facility_id(self, facility_id) -> None:
         _LOGGER.debug("Setting facility id to %s", facility_id)
         self._facility_id = str(facility_id)
 
-    def get_price_data(self):
+    def for_facility(self, facility_id) -> GreenelyApi:
+        """Return an api for another facility of the same account.
+
+        It shares the login and the client, so polling more facilities
+        adds neither logins nor connection pools.
+        """
+        api = GreenelyApi(
+            self._email,
+            self._password,
+            self._client,
+            self._session,
+            self._limiter,
+            self._base_url,
+        )
+        api.set_facility_id(facility_id)
+        return api
+
+    async def get_price_data(self):
         today = datetime.today()
         nextMonth = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
         start = "?from=" + str(today.year) + "-" + today.strftime("%m") + "-01"
@@ -43,16 +331,12 @@ class GreenelyApi:
             + end
             + "&resolution=daily&unit=currency&operation=sum"
         )
-        response = httpx.get(url, headers=self._headers)
-        data = {}
-        if response.status_code == httpx.codes.ok:
-            data = response.json()
-            return data["data"]
-        else:
-            _LOGGER.error("Failed to get price data, %s", response.text)
-            return data
+        data = await self._get_json(
+            url, "consumption", "Failed to get price data", PRIORITY_PRICES
+        )
+        return data["data"]
 
-    def get_spot_price(self):
+    async def get_spot_price(self, resolution="hourly"):
         today = datetime.today()
         yesterday = today - timedelta(days=1)
         tomorrow = today + timedelta(days=2)
@@ -78,18 +362,16 @@ class GreenelyApi:
             + "/spot-price"
             + start
             + end
-            + "&resolution=hourly"
+            + "&resolution="
+            + resolution
+        )
+        return await self._get_json(
+            url, "spot-price", "Failed to get spot price data", PRIORITY_PRICES
         )
-        response = httpx.get(url, headers=self._headers)
-        data = {}
-        if response.status_code == httpx.codes.ok:
-            data = response.json()
-            return data
-        else:
-            _LOGGER.error("Failed to get spot price data, %s", response.text)
-            return data
 
-    def get_usage(self, startDate, endDate, showHourly):
+    async def get_usage(
+        self, startDate, endDate, showHourly, priority=PRIORITY_DEFAULT
+    ):
         start = (
             "?from="
             + str(startDate.year)
@@ -116,40 +398,45 @@ class GreenelyApi:
             + "&resolution="
             + resolution
         )
-        response = httpx.get(url, headers=self._headers)
-        data = {}
-        if response.status_code == httpx.codes.ok:
-            data = response.json()
-            return data["data"]
-        else:
-            _LOGGER.error("Failed to fetch usage data, %s", response.text)
-            return data
+        data = await self._get_json(
+            url, "consumption", "Failed to fetch usage data", priority
+        )
+        return data["data"]
 
-    def get_facility_id(self):
-        result = httpx.get(self._url_facilities_base, headers=self._headers)
-        if result.status_code == httpx.codes.ok:
-            data = result.json()["data"]
-            facility = next((f for f in data if f["is_primary"] == True), None)
-            if facility == None:
-                _LOGGER.debug(
-                    "Found no primary facility, using the first one in the list!"
-                )
-                facility = data[0]
-            self._facility_id = str(data[0]["id"])
-            _LOGGER.debug("Fetched facility id %s", self._facility_id)
-            return self._facility_id
-        else:
-            _LOGGER.error("Failed to fetch facility id %s", result.reason)
+    async def get_facility_id(self):
+        """Look up the primary facility, the facility of this api is kept.
 
-    def get_facility_ids(self):
-        result = httpx.get(self._url_facilities_base, headers=self._headers)
-        if result.status_code == httpx.codes.ok:
-            data = result.json()["data"]
-            return data
-        else:
-            _LOGGER.error("Failed to fetch facility ids %s", result)
+        ensure_auth() resolves "primary" with this, so it sends the request
+        itself instead of going through _get, which calls ensure_auth().
+        """
+        response = await self._request(
+            "GET",
+            self._url_facilities_base,
+            "facilities",
+            headers=self._auth_headers(),
+        )
+        if response.status_code != httpx.codes.ok:
+            raise GreenelyApiError(
+                f"Failed to fetch facility id: {response.status_code}"
+            )
+        data = response.json()["data"]
+        facility = next((f for f in data if f["is_primary"] == True), None)
+        if facility == None:
+            _LOGGER.debug("Found no primary facility, using the first one in the list!")
+            facility = data[0]
+        facilityId = str(facility["id"])
+        _LOGGER.debug("Fetched facility id %s", facilityId)
+        return facilityId
+
+    async def get_facility_ids(self):
+        data = await self._get_json(
+            self._url_facilities_base, "facilities", "Failed to fetch facility ids"
+        )
+        return data["data"]
 
-    def get_produced_electricity(self, startDate, endDate, showHourly):
+    async def get_produced_electricity(
+        self, startDate, endDate, showHourly, priority=PRIORITY_DEFAULT
+    ):
         start = (
             "?from="
             + str(startDate.year)
@@ -177,47 +464,59 @@ class GreenelyApi:
             + resolution
         )
         _LOGGER.debug("Fetching produced electicity from url, %s", url)
-        response = httpx.get(url, headers=self._headers)
-        data = {}
-        if response.status_code == httpx.codes.ok:
-            data = response.json()
-            _LOGGER.debug(
-                "Fetched data for produced electricity endpoint, %s", data["data"]
-            )
-            return data["data"]
-        else:
-            _LOGGER.error(
-                "Failed to fetch produced electricity data, %s", response.text
-            )
-            return data
+        data = await self._get_json(
+            url,
+            "produced-electricity",
+            "Failed to fetch produced electricity data",
+            priority,
+        )
+        _LOGGER.debug(
+            "Fetched data for produced electricity endpoint, %s", data["data"]
+        )
+        return data["data"]
 
-    def check_auth(self):
-        """Check to see if our jwt is valid."""
-        result = httpx.get(self._url_check_auth, headers=self._headers)
+    async def check_auth(self):
+        """Check to see if our jwt is valid.
+
+        This asks the server, so it is only meant for diagnostics; regular
+        calls go through ensure_auth which tracks the expiry locally.
+        """
+        result = await self._request(
+            "GET", self._url_check_auth, "checkauth", headers=self._auth_headers()
+        )
         if result.status_code == httpx.codes.ok:
             _LOGGER.debug("jwt is valid!")
             return True
-        elif self.login() == False:
+        elif await self._relogin(self._session.jwt) == False:
             _LOGGER.debug(result.text)
             return False
         return True
 
-    def login(self):
+    async def login(self):
         """Login to the Greenely API."""
         result = False
         loginInfo = {"email": self._email, "password": self._password}
-        loginResult = httpx.post(
-            self._url_login, headers=self._headers, data=json.dumps(loginInfo)
+        loginResult = await self._request(
+            "POST",
+            self._url_login,
+            "login",
+            PRIORITY_PRICES,
+            headers=self._headers,
+            content=json.dumps(loginInfo),
         )
         if loginResult.status_code == httpx.codes.ok:
             jsonResult = loginResult.json()
-            self._jwt = "JWT " + jsonResult["jwt"]
-            self._headers["Authorization"] = self._jwt
-            _LOGGER.debug("Successfully logged in and updated jwt")
-            if self._facility_id == "primary":
-                self.get_facility_id()
+            self._session.jwt = "JWT " + jsonResult["jwt"]
+            expiry = _decode_jwt_expiry(jsonResult["jwt"])
+            if expiry is None:
+                self._session.refresh_at = None
             else:
-                _LOGGER.debug("Facility id is %s", self._facility_id)
+                # Keep at least half of a short-lived token's lifetime usable
+                now = time.time()
+                margin = min(TOKEN_REFRESH_MARGIN, (expiry - now) / 2)
+                self._session.refresh_at = expiry - max(margin, 0)
+            self._session.metrics.logged_in()
+            _LOGGER.debug("Successfully logged in and updated jwt")
             result = True
         else:
             _LOGGER.error(loginResult.text)
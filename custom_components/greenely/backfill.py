@@ -0,0 +1,147 @@
+"""Chunked import of long Greenely history into long-term statistics."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+import httpx
+
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .api import GreenelyApi
+from .const import BACKFILL_CONCURRENCY, BACKFILL_SERIES, DOMAIN, PRIORITY_BACKFILL
+from .parsing import parse_points
+
+if TYPE_CHECKING:
+    from .statistics import GreenelyStatistics
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+
+def month_chunks(start: date, end: date) -> list[tuple[date, date]]:
+    """Split [start, end) at month boundaries."""
+    chunks = []
+    while start < end:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        chunks.append((start, min(next_month, end)))
+        start = next_month
+    return chunks
+
+
+class GreenelyBackfill:
+    """Import the hourly history of a facility month by month.
+
+    A few months are fetched concurrently, then imported in order and
+    dropped before the next ones are fetched, so memory stays flat however
+    long the range is. Progress is stored after every month and an
+    interrupted backfill continues from there on the next start.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: GreenelyApi,
+        statistics: GreenelyStatistics | None,
+    ) -> None:
+        self._hass = hass
+        self._api = api
+        self._statistics = statistics
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{api.facility_id}.backfill"
+        )
+        self._jobs: dict[str, dict[str, Any]] | None = None
+        self._lock = asyncio.Lock()
+
+    async def _async_load(self) -> dict[str, dict[str, Any]]:
+        if self._jobs is None:
+            stored = await self._store.async_load()
+            self._jobs = stored["jobs"] if stored else {}
+        return self._jobs
+
+    async def _async_save(self) -> None:
+        await self._store.async_save({"jobs": self._jobs})
+
+    async def async_start(self, series: list[str], start: date) -> None:
+        """Backfill series from start until today, replacing unfinished jobs."""
+        jobs = await self._async_load()
+        for name in series:
+            jobs[name] = {"next": start.isoformat(), "total": None}
+        await self._async_save()
+        await self.async_resume()
+
+    async def async_resume(self) -> None:
+        """Run the jobs that have not finished yet."""
+        for name in list(await self._async_load()):
+            try:
+                await self._async_run(name)
+            except httpx.HTTPError as err:
+                _LOGGER.warning(
+                    "Backfill of %s stopped, it continues on the next start: %s",
+                    name,
+                    err,
+                )
+
+    async def _async_run(self, series: str) -> None:
+        async with self._lock:
+            job = self._jobs.get(series)
+            if job is None:
+                return
+            name, method, value_key = BACKFILL_SERIES[series]
+            fetch = getattr(self._api, method)
+            if self._statistics is None:
+                # The recorder is only loaded once something is imported
+                from .statistics import GreenelyStatistics
+
+                self._statistics = GreenelyStatistics(self._hass, self._api.facility_id)
+            start = date.fromisoformat(job["next"])
+            if job["total"] is None:
+                job["total"] = await self._statistics.async_sum_before(
+                    series, datetime.combine(start, datetime.min.time())
+                )
+            chunks = month_chunks(start, date.today() + timedelta(days=1))
+            _LOGGER.info(
+                "Backfilling %s of facility %s from %s in %s chunks",
+                series,
+                self._api.facility_id,
+                start,
+                len(chunks),
+            )
+
+            for index in range(0, len(chunks), BACKFILL_CONCURRENCY):
+                batch = chunks[index : index + BACKFILL_CONCURRENCY]
+                responses = await asyncio.gather(
+                    *(
+                        fetch(chunkStart, chunkEnd, True, PRIORITY_BACKFILL)
+                        for chunkStart, chunkEnd in batch
+                    )
+                )
+                for (chunkStart, chunkEnd), response in zip(batch, responses):
+                    lower = datetime.combine(chunkStart, datetime.min.time())
+                    upper = datetime.combine(chunkEnd, datetime.min.time())
+                    # The range end may be inclusive, never import a day twice
+                    points = [
+                        (moment, value / 1000 if value is not None else None)
+                        for moment, value in parse_points(response, value_key)
+                        if lower <= moment < upper
+                    ]
+                    job["total"] = await self._statistics.async_backfill(
+                        series, name, UnitOfEnergy.KILO_WATT_HOUR, points, job["total"]
+                    )
+                    job["next"] = chunkEnd.isoformat()
+                    await self._async_save()
+                del responses
+
+            # A start while this job ran replaced it, that one still has to run
+            if self._jobs.get(series) is job:
+                del self._jobs[series]
+            await self._async_save()
+            _LOGGER.info(
+                "Finished backfilling %s of facility %s", series, self._api.facility_id
+            )
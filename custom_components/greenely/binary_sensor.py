@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
+from homeassistant.helpers.event import async_track_time_change
+
+from . import GreenelyData
+from .entity import GreenelyEntity
+from .const import (
+    DOMAIN,
+    GREENELY_FACILITY_ID,
+    SENSOR_CHEAPEST_WINDOW_NAME,
+    SENSOR_MOST_EXPENSIVE_WINDOW_NAME,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: GreenelyData,
+    async_add_entities,
+):
+    """Setup binary sensors from a config entry created in the integrations UI."""
+    facility_id = str(config_entry.options.get(GREENELY_FACILITY_ID))
+    suffix = ""
+
+    sensors = []
+
+    for coordinator in config_entry.runtime_data.coordinators:
+        if coordinator is not config_entry.runtime_data.coordinator:
+            # Extra facilities of the login get the facility id in their names
+            facility_id = coordinator.api.facility_id
+            suffix = f" {facility_id}"
+
+        if coordinator.prices:
+            for hours in coordinator.price_window_hours:
+                sensors.append(
+                    GreenelyPriceWindowSensor(
+                        SENSOR_CHEAPEST_WINDOW_NAME.format(hours=hours) + suffix,
+                        coordinator,
+                        facility_id,
+                        hours,
+                        "cheapest",
+                    )
+                )
+                sensors.append(
+                    GreenelyPriceWindowSensor(
+                        SENSOR_MOST_EXPENSIVE_WINDOW_NAME.format(hours=hours) + suffix,
+                        coordinator,
+                        facility_id,
+                        hours,
+                        "most_expensive",
+                    )
+                )
+
+    async_add_entities(sensors)
+
+
+class GreenelyPriceWindowSensor(GreenelyEntity, BinarySensorEntity):
+    """On while now is inside today's cheapest or most expensive window."""
+
+    def __init__(self, name, coordinator, facility_id, hours, kind):
+        super().__init__(coordinator)
+        self._name = name
+        self._icon = "mdi:cash-clock" if kind == "cheapest" else "mdi:cash-remove"
+        self._state = False
+        self._state_attributes = {}
+        self._facility_id = facility_id
+        self._hours = hours
+        self._kind = kind
+        self._render()
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return self._icon
+
+    @property
+    def is_on(self):
+        """Return true if now is inside the window."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        return self._state_attributes
+
+    @property
+    def unique_id(self):
+        """Return a unique ID."""
+        return f"{self._facility_id}_{self._kind}_{self._hours}h"
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            name="Greenely",
+            identifiers={(DOMAIN, self._facility_id)},
+            manufacturer="Greenely",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # The windows are indexed per fetch, only the lookup runs per slot
+        slot_minutes = self.coordinator.spot_price_step // 60
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass,
+                self._handle_time_change,
+                minute=list(range(0, 60, slot_minutes)),
+                second=0,
+            )
+        )
+
+    @callback
+    def _handle_time_change(self, now: datetime) -> None:
+        self._update_from_coordinator()
+        # Most slots neither start nor end a window
+        self.async_write_if_changed()
+
+    def _inputs(self):
+        return (self.coordinator.data.spot_price_windows,)
+
+    def _update_from_coordinator(self):
+        """Update state and attributes."""
+        self._state = False
+        self._state_attributes = {}
+        index = self.coordinator.data.spot_price_windows
+        if index is None:
+            return
+        now = datetime.now()
+        days = index.cheapest if self._kind == "cheapest" else index.most_expensive
+        window = days.get(now.date(), {}).get(self._hours)
+        if window is None:
+            return
+        self._state = window.contains(now)
+        self._state_attributes["start"] = window.start.isoformat()
+        self._state_attributes["end"] = window.end.isoformat()
+        self._state_attributes["average_price"] = round(window.average / 100000, 4)
+        next_window = days.get(now.date() + timedelta(days=1), {}).get(self._hours)
+        if next_window is not None:
+            self._state_attributes["next_day_start"] = next_window.start.isoformat()
@@ -0,0 +1,215 @@
+"""Persistent cache of finalized Greenely history."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    HISTORY_GAP_RETRY_ATTEMPTS,
+    HISTORY_GAP_RETRY_DAYS,
+    HISTORY_GAP_RETRY_INTERVAL,
+    HISTORY_SAVE_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+LOCALTIME_FORMAT = "%Y-%m-%d %H:%M"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+class GreenelyHistoryCache:
+    """Finalized days of a facility's series, keyed by series and day.
+
+    A series is an endpoint at a resolution, e.g. ``usage_daily``. Days
+    are only marked complete once they are older than the finalize cutoff,
+    after that they are served from here instead of being fetched again.
+    A complete day that still misses values is also kept as a gap, which
+    is fetched again on its own for a while in case the meter data is late.
+    """
+
+    def __init__(self, hass: HomeAssistant, facility_id: str) -> None:
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{facility_id}.history"
+        )
+        self._series: dict[str, dict[str, Any]] = {}
+        self._loaded = False
+
+    async def async_load(self) -> None:
+        """Load the cache from disk, once."""
+        if self._loaded:
+            return
+        stored = await self._store.async_load()
+        if stored:
+            for name, series in stored.get("series", {}).items():
+                # Older caches kept points without a value, and then left
+                # their days out
+                missing = {
+                    localtime[:10]
+                    for localtime, value in series["points"].items()
+                    if value is None
+                }
+                self._series[name] = {
+                    "days": set(series["days"]) | missing,
+                    "points": {
+                        localtime: value
+                        for localtime, value in series["points"].items()
+                        if value is not None
+                    },
+                    "gaps": {
+                        **{day: [0, 0.0] for day in missing},
+                        **series.get("gaps", {}),
+                    },
+                }
+        self._loaded = True
+
+    def _get_series(self, name: str) -> dict[str, Any]:
+        return self._series.setdefault(name, {"days": set(), "points": {}, "gaps": {}})
+
+    def first_missing_day(
+        self, name: str, start: datetime, cutoff: datetime
+    ) -> datetime:
+        """Return the first day from start that still has to be fetched."""
+        days = self._get_series(name)["days"]
+        day = start
+        while day < cutoff and day.strftime(DAY_FORMAT) in days:
+            day += timedelta(days=1)
+        return day
+
+    def due_gaps(self, name: str, start: datetime) -> list[datetime]:
+        """Return the gap days from start that should be fetched again.
+
+        Gaps older than HISTORY_GAP_RETRY_DAYS or retried too often are
+        given up, their days stay complete with the values they have.
+        """
+        gaps = self._get_series(name)["gaps"]
+        oldest = (datetime.now() - timedelta(days=HISTORY_GAP_RETRY_DAYS)).strftime(
+            DAY_FORMAT
+        )
+        expired = [
+            day
+            for day, (attempts, _) in gaps.items()
+            if day < oldest or attempts >= HISTORY_GAP_RETRY_ATTEMPTS
+        ]
+        for day in expired:
+            _LOGGER.debug("Giving up on the missing values of %s %s", name, day)
+            del gaps[day]
+        lower = start.strftime(DAY_FORMAT)
+        now = time.time()
+        due = [
+            day
+            for day, (_, retry_at) in sorted(gaps.items())
+            if day >= lower and retry_at <= now
+        ]
+        # Counted when handed out, so a failing fetch is not retried sooner
+        for day in due:
+            gaps[day] = [
+                gaps[day][0] + 1,
+                now + HISTORY_GAP_RETRY_INTERVAL.total_seconds(),
+            ]
+        if expired or due:
+            self._async_schedule_save()
+        return [datetime.strptime(day, DAY_FORMAT) for day in due]
+
+    def update(
+        self, name: str, response: dict[str, Any], value_key: str, cutoff: datetime
+    ) -> bool:
+        """Store the points of a response that fall before the cutoff.
+
+        Points without a value are left out, their day is complete but kept
+        as a gap so it is fetched again. Returns whether points were added.
+        """
+        series = self._get_series(name)
+        points = series["points"]
+        upper = cutoff.strftime(LOCALTIME_FORMAT)
+        days = set()
+        incomplete = set()
+        added = False
+        for point in response.values():
+            localtime = point["localtime"]
+            # The fixed timestamp layout sorts the same as the times do
+            if localtime >= upper:
+                continue
+            days.add(localtime[:10])
+            value = point[value_key]
+            if value is None:
+                incomplete.add(localtime[:10])
+            elif points.get(localtime) != value:
+                points[localtime] = value
+                added = True
+        gaps = series["gaps"]
+        retry_at = time.time() + HISTORY_GAP_RETRY_INTERVAL.total_seconds()
+        changed = added or not days <= series["days"]
+        for day in days:
+            if day not in incomplete:
+                changed |= gaps.pop(day, None) is not None
+            elif day not in gaps:
+                gaps[day] = [0, retry_at]
+                changed = True
+        series["days"] |= days
+        if changed:
+            self._async_schedule_save()
+        return added
+
+    def merge(
+        self,
+        name: str,
+        start: datetime,
+        fetched_from: datetime,
+        response: dict[str, Any],
+        value_key: str,
+    ) -> dict[str, Any]:
+        """Combine cached points in [start, fetched_from) with a fresh response.
+
+        The result has the same shape as the API response so it is parsed
+        like a fresh one.
+        """
+        lower = start.strftime(LOCALTIME_FORMAT)
+        upper = fetched_from.strftime(LOCALTIME_FORMAT)
+        merged = {
+            localtime: {"localtime": localtime, value_key: value}
+            for localtime, value in self._get_series(name)["points"].items()
+            if lower <= localtime < upper
+        }
+        for point in response.values():
+            merged[point["localtime"]] = point
+        return merged
+
+    def prune(self, name: str, start: datetime) -> None:
+        """Drop points older than the widest window still in use."""
+        series = self._get_series(name)
+        lower = start.strftime(LOCALTIME_FORMAT)
+        stale = [localtime for localtime in series["points"] if localtime < lower]
+        if not stale:
+            return
+        for localtime in stale:
+            del series["points"][localtime]
+        first_day = lower[:10]
+        series["days"] = {day for day in series["days"] if day >= first_day}
+        series["gaps"] = {
+            day: gap for day, gap in series["gaps"].items() if day >= first_day
+        }
+        self._async_schedule_save()
+
+    def _async_schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, HISTORY_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {
+            "series": {
+                name: {
+                    "days": sorted(series["days"]),
+                    "points": series["points"],
+                    "gaps": series["gaps"],
+                }
+                for name, series in self._series.items()
+            }
+        }
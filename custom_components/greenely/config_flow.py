@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import voluptuous as vol
 
@@ -17,23 +18,39 @@ from homeassistant.const import CONF_EMAIL, CONF_PASSWORD
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
 
-from .api import GreenelyApi
-
 from .const import (
     DOMAIN,
+    SETUP_TIMEOUT,
     GREENELY_DAILY_PRODUCED_ELECTRICITY,
+    GREENELY_COMPACT_ATTRIBUTES,
+    GREENELY_COST_FEE,
+    GREENELY_COST_MARKUP,
     GREENELY_DAILY_USAGE,
+    GREENELY_DATA_ATTRIBUTES,
     GREENELY_DATE_FORMAT,
+    GREENELY_DIAGNOSTIC_SENSORS,
     GREENELY_FACILITY_ID,
+    GREENELY_FACILITY_IDS,
     GREENELY_HOMEKIT_COMPATIBLE,
     GREENELY_HOURLY_OFFSET_DAYS,
     GREENELY_HOURLY_USAGE,
+    GREENELY_PRICE_WINDOW_HOURS,
     GREENELY_PRICES,
     GREENELY_PRODUCED_ELECTRICITY_DAYS,
+    GREENELY_REQUEST_BUDGET,
+    GREENELY_SPOT_PRICE_RESOLUTION,
+    GREENELY_STATISTICS,
     GREENELY_TIME_FORMAT,
     GREENELY_USAGE_DAYS,
+    RATE_LIMIT_BUDGET,
+    SPOT_PRICE_RESOLUTIONS,
 )
 
+if TYPE_CHECKING:
+    import httpx
+
+    from .ratelimit import RateLimiter
+
 _LOGGER = logging.getLogger(__name__)
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
@@ -48,17 +65,25 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 class Greenelyhub:
     """Class to authenticate with the host."""
 
-    def __init__(self, email: str, password: str):
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        client: httpx.AsyncClient,
+        limiter: RateLimiter | None = None,
+    ):
+        from .api import GreenelyApi
+
         self.email = email
         self.password = password
-        self.api = GreenelyApi(self.email, self.password)
+        self.api = GreenelyApi(self.email, self.password, client, limiter=limiter)
 
     async def authenticate(self) -> bool:
         """Test if we can authenticate with the host."""
-        return self.api.check_auth()
+        return await self.api.ensure_auth()
 
     async def get_facility_id(self) -> int:
-        return int(self.api.get_facility_id())
+        return int(await self.api.get_facility_id())
 
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
@@ -66,13 +91,26 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
 
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
     """
+    # The api and httpx are only needed once the user submits the form
+    import httpx
+
+    from .api import async_get_client, get_rate_limiter
 
-    hub = Greenelyhub(data[CONF_EMAIL], data[CONF_PASSWORD])
+    hub = Greenelyhub(
+        data[CONF_EMAIL],
+        data[CONF_PASSWORD],
+        await async_get_client(hass),
+        get_rate_limiter(hass, data[CONF_EMAIL]),
+    )
 
-    if not await hub.authenticate():
-        raise InvalidAuth
+    try:
+        async with asyncio.timeout(SETUP_TIMEOUT):
+            if not await hub.authenticate():
+                raise InvalidAuth
 
-    facilityId = data.get(GREENELY_FACILITY_ID, await hub.get_facility_id())
+            facilityId = data.get(GREENELY_FACILITY_ID) or await hub.get_facility_id()
+    except (TimeoutError, httpx.HTTPError) as err:
+        raise CannotConnect from err
 
     # Return info that you want to store in the config entry.
     return {
@@ -102,6 +140,8 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             try:
                 info = await validate_input(self.hass, user_input)
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
             except InvalidAuth:
                 errors["base"] = "invalid_auth"
             except Exception:
@@ -194,6 +234,58 @@ class GreenelyOptionsFlow(OptionsFlow):
                     GREENELY_FACILITY_ID,
                     default=self.config_entry.options.get(GREENELY_FACILITY_ID),
                 ): int,
+                vol.Optional(
+                    GREENELY_SPOT_PRICE_RESOLUTION,
+                    default=self.config_entry.options.get(
+                        GREENELY_SPOT_PRICE_RESOLUTION, "hourly"
+                    ),
+                ): vol.In(list(SPOT_PRICE_RESOLUTIONS)),
+                vol.Optional(
+                    GREENELY_PRICE_WINDOW_HOURS,
+                    default=self.config_entry.options.get(
+                        GREENELY_PRICE_WINDOW_HOURS, "3"
+                    ),
+                ): str,
+                vol.Optional(
+                    GREENELY_COST_FEE,
+                    default=self.config_entry.options.get(GREENELY_COST_FEE, 0.0),
+                ): vol.Coerce(float),
+                vol.Optional(
+                    GREENELY_COST_MARKUP,
+                    default=self.config_entry.options.get(GREENELY_COST_MARKUP, 0.0),
+                ): vol.Coerce(float),
+                vol.Optional(
+                    GREENELY_FACILITY_IDS,
+                    default=self.config_entry.options.get(GREENELY_FACILITY_IDS, ""),
+                ): str,
+                vol.Optional(
+                    GREENELY_REQUEST_BUDGET,
+                    default=self.config_entry.options.get(
+                        GREENELY_REQUEST_BUDGET, RATE_LIMIT_BUDGET
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    GREENELY_DIAGNOSTIC_SENSORS,
+                    default=self.config_entry.options.get(
+                        GREENELY_DIAGNOSTIC_SENSORS, False
+                    ),
+                ): bool,
+                vol.Optional(
+                    GREENELY_DATA_ATTRIBUTES,
+                    default=self.config_entry.options.get(
+                        GREENELY_DATA_ATTRIBUTES, True
+                    ),
+                ): bool,
+                vol.Optional(
+                    GREENELY_COMPACT_ATTRIBUTES,
+                    default=self.config_entry.options.get(
+                        GREENELY_COMPACT_ATTRIBUTES, False
+                    ),
+                ): bool,
+                vol.Optional(
+                    GREENELY_STATISTICS,
+                    default=self.config_entry.options.get(GREENELY_STATISTICS, False),
+                ): bool,
                 vol.Optional(
                     GREENELY_HOMEKIT_COMPATIBLE,
                     default=self.config_entry.options.get(
@@ -203,5 +295,10 @@ class GreenelyOptionsFlow(OptionsFlow):
             }
         )
 
+
 class InvalidAuth(HomeAssistantError):
     """Error to indicate there is invalid auth."""
+
+
+class CannotConnect(HomeAssistantError):
+    """Error to indicate we cannot connect."""
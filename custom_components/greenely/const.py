@@ -1,13 +1,24 @@
 """Constants for the Greenely integration."""
 
+from datetime import time, timedelta
+
 DOMAIN = "greenely"
 
+SCAN_INTERVAL = timedelta(minutes=10)
+
 
 SENSOR_DAILY_USAGE_NAME = "Greenely Daily Usage"
 SENSOR_HOURLY_USAGE_NAME = "Greenely Hourly Usage"
 SENSOR_DAILY_PRODUCED_ELECTRICITY_NAME = "Greenely Daily Produced Electricity"
 SENSOR_SOLD_NAME = "Greenely Sold"
 SENSOR_PRICES_NAME = "Greenely Prices"
+SENSOR_API_REQUESTS_NAME = "Greenely API Requests"
+SENSOR_API_ERRORS_NAME = "Greenely API Errors"
+SENSOR_API_LATENCY_NAME = "Greenely API Latency"
+SENSOR_API_LOGINS_NAME = "Greenely API Logins"
+SENSOR_API_TOKEN_AGE_NAME = "Greenely API Token Age"
+SENSOR_CHEAPEST_WINDOW_NAME = "Greenely Cheapest {hours}h"
+SENSOR_MOST_EXPENSIVE_WINDOW_NAME = "Greenely Most Expensive {hours}h"
 
 GREENELY_PRICES = "prices"
 GREENELY_DAILY_USAGE = "daily_usage"
@@ -19,9 +30,110 @@ GREENELY_DATE_FORMAT = "date_format"
 GREENELY_TIME_FORMAT = "time_format"
 GREENELY_HOURLY_OFFSET_DAYS = "hourly_offset_days"
 GREENELY_FACILITY_ID = "facility_id"
+GREENELY_FACILITY_IDS = "facility_ids"
+GREENELY_REQUEST_BUDGET = "request_budget"
+GREENELY_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
 GREENELY_HOMEKIT_COMPATIBLE = "homekit_compatible"
+GREENELY_STATISTICS = "statistics"
+GREENELY_DATA_ATTRIBUTES = "data_attributes"
+GREENELY_COMPACT_ATTRIBUTES = "compact_attributes"
+GREENELY_SPOT_PRICE_RESOLUTION = "spot_price_resolution"
+GREENELY_PRICE_WINDOW_HOURS = "price_window_hours"
+GREENELY_COST_FEE = "cost_fee"
+GREENELY_COST_MARKUP = "cost_markup"
 
 
 GREENELY_SOLD = "sold"
 GREENELY_SOLD_MEASURE = "sold_measure"
 GREENELY_SOLD_DAILY = "sold_daily"
+
+DATA_CLIENT = f"{DOMAIN}_client"
+DATA_RATE_LIMITERS = f"{DOMAIN}_rate_limiters"
+# Sent with the facility id after each refresh of an entry's facilities
+SIGNAL_API_METRICS = f"{DOMAIN}_api_metrics_{{}}"
+
+API_BASE_URL = "https://api2.greenely.com"
+API_TIMEOUT = 20
+API_CONNECT_TIMEOUT = 10
+API_MAX_CONNECTIONS = 4
+# Outlive the polling interval so the next cycle reuses the open connection
+API_KEEPALIVE_EXPIRY = 660
+# Recent responses kept per login to answer conditional requests
+API_RESPONSE_CACHE_SIZE = 32
+
+# Facilities of one login that are fetched at the same time
+FACILITY_REFRESH_CONCURRENCY = 4
+
+# Tries per endpoint for transport errors, 429 and 5xx responses
+RETRY_ATTEMPTS = {
+    "login": 2,
+    "checkauth": 1,
+    "facilities": 2,
+    "consumption": 3,
+    "spot-price": 3,
+    "produced-electricity": 3,
+}
+RETRY_BACKOFF_BASE = 1
+RETRY_BACKOFF_MAX = 30
+
+# Requests per hour an account may send, shared by all of its entries
+RATE_LIMIT_BUDGET = 240
+RATE_LIMIT_BURST = 20
+# Share of the burst that backfill requests leave for everything else
+RATE_LIMIT_RESERVE = 0.25
+
+# Order in which waiting requests get the budget, lowest first
+PRIORITY_PRICES = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKFILL = 2
+
+# Upper bounds in seconds of the request latency histogram buckets
+METRICS_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Consecutive failed calls before calls are paused, and for how long
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_OPEN_MIN = 60
+BREAKER_OPEN_MAX = 1800
+
+# Upper bound for the login round-trips done during setup and service calls
+SETUP_TIMEOUT = 30
+
+# Refresh the jwt this many seconds before its exp claim
+TOKEN_REFRESH_MARGIN = 300
+
+# Days older than this many days are final and served from the history cache
+HISTORY_FINALIZED_DAYS = 2
+HISTORY_SAVE_DELAY = 60
+# Cached days with missing values are fetched again, a day at a time, this
+# often until they are this many days old or were retried this many times
+HISTORY_GAP_RETRY_INTERVAL = timedelta(hours=3)
+HISTORY_GAP_RETRY_DAYS = 7
+HISTORY_GAP_RETRY_ATTEMPTS = 8
+SNAPSHOT_SAVE_DELAY = 30
+
+# Nordic day-ahead prices for tomorrow are expected shortly after this time
+SPOT_PRICE_PUBLISH_TIME = time(13, 0)
+SPOT_PRICE_RETRY_MIN = timedelta(minutes=10)
+SPOT_PRICE_RETRY_MAX = timedelta(hours=1)
+
+# How far back the statistics import keeps hourly history when first enabled
+STATISTICS_BACKFILL_DAYS = 30
+
+# The month to date cost is computed locally, the currency endpoint is only
+# polled this often to reconcile it with what Greenely reports
+COST_RECONCILE_INTERVAL = timedelta(hours=6)
+
+# Months of history fetched at the same time by the backfill service
+BACKFILL_CONCURRENCY = 3
+# statistic kind, name and the api method and value key of each series
+BACKFILL_SERIES = {
+    "usage": ("Greenely usage", "get_usage", "usage"),
+    "produced_electricity": (
+        "Greenely produced electricity",
+        "get_produced_electricity",
+        "value",
+    ),
+}
+
+# Spot price resolutions accepted by the API and their slot length in seconds
+SPOT_PRICE_RESOLUTIONS = {"hourly": 3600, "quarter_hourly": 900}
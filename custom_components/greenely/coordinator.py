@@ -0,0 +1,509 @@
+"""Data update coordinator for the Greenely integration."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+import httpx
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .api import GreenelyApi
+from .backfill import GreenelyBackfill
+from .cache import GreenelyHistoryCache
+from .costs import CostEngine
+from .parsing import Points, parse_points
+from .scheduler import SpotPriceSchedule
+from .series import DAY, HOUR, Series
+from .snapshot import SNAPSHOT_SERIES, GreenelySnapshot
+from .windows import PriceWindowIndex, build_window_index
+from .const import (
+    DOMAIN,
+    COST_RECONCILE_INTERVAL,
+    FACILITY_REFRESH_CONCURRENCY,
+    HISTORY_FINALIZED_DAYS,
+    PRIORITY_BACKFILL,
+    PRIORITY_DEFAULT,
+    SIGNAL_API_METRICS,
+    GREENELY_COMPACT_ATTRIBUTES,
+    GREENELY_COST_FEE,
+    GREENELY_COST_MARKUP,
+    GREENELY_DATA_ATTRIBUTES,
+    GREENELY_DAILY_PRODUCED_ELECTRICITY,
+    GREENELY_DAILY_USAGE,
+    GREENELY_HOURLY_OFFSET_DAYS,
+    GREENELY_HOURLY_USAGE,
+    GREENELY_PRICE_WINDOW_HOURS,
+    GREENELY_PRICES,
+    GREENELY_PRODUCED_ELECTRICITY_DAYS,
+    GREENELY_SPOT_PRICE_RESOLUTION,
+    GREENELY_STATISTICS,
+    GREENELY_USAGE_DAYS,
+    SPOT_PRICE_RESOLUTIONS,
+    STATISTICS_BACKFILL_DAYS,
+)
+
+if TYPE_CHECKING:
+    from .statistics import GreenelyStatistics
+
+_LOGGER = logging.getLogger(__name__)
+
+# The fetched values, the other fields are derived from them
+UNCHANGED_FIELDS = SNAPSHOT_SERIES + ("cost_today", "cost_month")
+
+
+@dataclass
+class GreenelyCoordinatorData:
+    """Responses fetched once per cycle, parsed once and shared by all entities."""
+
+    daily_usage: Series | None = None
+    hourly_usage: Series | None = None
+    cost_today: float | None = None
+    cost_month: float | None = None
+    spot_price: Series | None = None
+    produced_electricity: Series | None = None
+    spot_price_windows: PriceWindowIndex | None = None
+
+
+class GreenelyDataUpdateCoordinator(DataUpdateCoordinator[GreenelyCoordinatorData]):
+    """Fetch every enabled Greenely endpoint of one facility.
+
+    The coordinators of a config entry do not poll on their own, they are
+    refreshed together by GreenelyFacilities.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, api: GreenelyApi):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {api.facility_id}",
+            update_interval=None,
+            # An unchanged refresh returns the previous data, nothing to tell
+            always_update=False,
+        )
+        self.api = api
+        self.cache = GreenelyHistoryCache(hass, api.facility_id)
+        self.spot_price_schedule = SpotPriceSchedule()
+        self._spot_price_response: dict[str, Any] | None = None
+        self.costs = CostEngine(
+            entry.options.get(GREENELY_COST_FEE, 0.0),
+            entry.options.get(GREENELY_COST_MARKUP, 0.0),
+        )
+        self._costs_reconciled_at: datetime | None = None
+        self._month_spot_price: Points = []
+        # Per series the window, response and points of the last fetch
+        self._history: dict[str, tuple[tuple[datetime, ...], Any, Points]] = {}
+        self._series: dict[str, tuple[Points, Series]] = {}
+        self.daily_usage = entry.data.get(GREENELY_DAILY_USAGE, True)
+        self.prices = entry.data.get(GREENELY_PRICES, True)
+        self.hourly_usage = entry.options.get(GREENELY_HOURLY_USAGE, False)
+        self.produced_electricity = entry.options.get(
+            GREENELY_DAILY_PRODUCED_ELECTRICITY, False
+        )
+        self.usage_days = entry.options.get(GREENELY_USAGE_DAYS, 10)
+        self.production_days = entry.options.get(GREENELY_PRODUCED_ELECTRICITY_DAYS, 10)
+        self.hourly_offset_days = entry.options.get(GREENELY_HOURLY_OFFSET_DAYS, 1)
+        self.spot_price_resolution = entry.options.get(
+            GREENELY_SPOT_PRICE_RESOLUTION, "hourly"
+        )
+        self.spot_price_step = SPOT_PRICE_RESOLUTIONS[self.spot_price_resolution]
+        self.price_window_hours = sorted(
+            {
+                int(hours)
+                for hours in str(
+                    entry.options.get(GREENELY_PRICE_WINDOW_HOURS, "3")
+                ).split(",")
+                if hours.strip().isdigit() and int(hours) > 0
+            }
+        )
+        self.data_attributes = entry.options.get(GREENELY_DATA_ATTRIBUTES, True)
+        self.compact_attributes = entry.options.get(GREENELY_COMPACT_ATTRIBUTES, False)
+        self.statistics: GreenelyStatistics | None = None
+        if entry.options.get(GREENELY_STATISTICS, False):
+            # Loads the recorder, so only when the option is on
+            from .statistics import GreenelyStatistics
+
+            self.statistics = GreenelyStatistics(hass, api.facility_id)
+        self.backfill = GreenelyBackfill(hass, api, self.statistics)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the fetched series and costs in a storable form."""
+        stored = {}
+        for name in SNAPSHOT_SERIES:
+            series = getattr(self.data, name)
+            stored[name] = series.as_dict() if series is not None else None
+        stored["cost_today"] = self.data.cost_today
+        stored["cost_month"] = self.data.cost_month
+        return stored
+
+    def restore(self, stored: dict[str, Any]) -> None:
+        """Start from a snapshot until the first refresh replaces it."""
+        data = GreenelyCoordinatorData(
+            cost_today=stored.get("cost_today"), cost_month=stored.get("cost_month")
+        )
+        for name in SNAPSHOT_SERIES:
+            if isinstance(stored.get(name), dict):
+                setattr(data, name, Series.from_dict(stored[name]))
+        if data.spot_price:
+            data.spot_price_windows = build_window_index(
+                data.spot_price, self.price_window_hours
+            )
+        self.data = data
+
+    async def _async_update_data(self) -> GreenelyCoordinatorData:
+        """Fetch all enabled endpoints for the facility."""
+        try:
+            return await self._async_fetch()
+        except httpx.HTTPError as err:
+            raise UpdateFailed(f"Error communicating with Greenely: {err}") from err
+
+    async def _async_fetch(self) -> GreenelyCoordinatorData:
+        if not await self.api.ensure_auth():
+            raise UpdateFailed("Unable to log in!")
+
+        await self.cache.async_load()
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoff = today - timedelta(days=HISTORY_FINALIZED_DAYS)
+        data = GreenelyCoordinatorData()
+
+        if self.daily_usage:
+            _LOGGER.debug("Fetching daily usage data...")
+            startDate = today - timedelta(days=self.usage_days)
+            daily_usage = await self._async_fetch_history(
+                "usage_daily",
+                "usage",
+                startDate,
+                today,
+                cutoff,
+                lambda start, end, priority: self.api.get_usage(
+                    start, end, False, priority
+                ),
+            )
+            data.daily_usage = self._to_series("usage_daily", daily_usage, DAY)
+
+        hourly_usage: Points = []
+        if self.hourly_usage or self.statistics or self.prices:
+            _LOGGER.debug("Fetching hourly usage data...")
+            startDate = today - timedelta(days=self.hourly_offset_days)
+            previous_hourly_usage = self._history_points("usage_hourly")
+            hourly_usage = await self._async_fetch_history(
+                "usage_hourly",
+                "usage",
+                self._history_start(today, startDate),
+                today,
+                cutoff,
+                lambda start, end, priority: self.api.get_usage(
+                    start, end, True, priority
+                ),
+            )
+            if self.data and hourly_usage is previous_hourly_usage:
+                data.hourly_usage = self.data.hourly_usage
+            if data.hourly_usage is None:
+                data.hourly_usage = Series.from_points(
+                    [p for p in hourly_usage if p[0] >= startDate], HOUR
+                )
+            if self.statistics:
+                await self.statistics.async_import(
+                    "usage",
+                    "Greenely usage",
+                    UnitOfEnergy.KILO_WATT_HOUR,
+                    _to_kilo(hourly_usage),
+                    has_sum=True,
+                )
+
+        if self.prices:
+            _LOGGER.debug("Fetching daily prices...")
+            response = await self._async_fetch_spot_price()
+            if self.data and response is self._spot_price_response:
+                data.spot_price = self.data.spot_price
+                data.spot_price_windows = self.data.spot_price_windows
+            elif response:
+                data.spot_price = Series.from_response(
+                    response["data"], "price", self.spot_price_step
+                )
+                data.spot_price_windows = build_window_index(
+                    data.spot_price, self.price_window_hours
+                )
+                self._month_spot_price = self._cache_spot_price(response, today)
+            self._spot_price_response = response
+            if self.statistics and data.spot_price:
+                await self.statistics.async_import(
+                    "spot_price",
+                    "Greenely spot price",
+                    "SEK/kWh",
+                    [
+                        (moment, price / 100000 if price is not None else None)
+                        for moment, price in data.spot_price.resample(HOUR, mean=True)
+                    ],
+                    has_sum=False,
+                    until=datetime.now(),
+                )
+            await self._async_update_costs(data, hourly_usage, today, cutoff)
+
+        if self.produced_electricity:
+            _LOGGER.debug("Fetching daily produced electricity data...")
+            startDate = today - timedelta(days=(self.production_days - 1))
+            endDate = today + timedelta(days=1)
+            produced_electricity = await self._async_fetch_history(
+                "produced_daily",
+                "value",
+                startDate,
+                endDate,
+                cutoff,
+                lambda start, end, priority: self.api.get_produced_electricity(
+                    start, end, False, priority
+                ),
+            )
+            data.produced_electricity = self._to_series(
+                "produced_daily", produced_electricity, DAY
+            )
+            if self.statistics:
+                hourly_production = await self._async_fetch_history(
+                    "produced_hourly",
+                    "value",
+                    self._history_start(today, today),
+                    endDate,
+                    cutoff,
+                    lambda start, end, priority: self.api.get_produced_electricity(
+                        start, end, True, priority
+                    ),
+                )
+                await self.statistics.async_import(
+                    "produced_electricity",
+                    "Greenely produced electricity",
+                    UnitOfEnergy.KILO_WATT_HOUR,
+                    _to_kilo(hourly_production),
+                    has_sum=True,
+                )
+
+        if self.data is not None and all(
+            getattr(data, name) == getattr(self.data, name) for name in UNCHANGED_FIELDS
+        ):
+            # Keep the parsed data and everything derived from it
+            return self.data
+        return data
+
+    def _history_start(self, today: datetime, startDate: datetime) -> datetime:
+        """Widen a window to what statistics and costs need to keep cached."""
+        if self.prices:
+            startDate = min(startDate, today.replace(day=1))
+        if not self.statistics:
+            return startDate
+        return min(startDate, today - timedelta(days=STATISTICS_BACKFILL_DAYS))
+
+    def _cache_spot_price(self, response: dict[str, Any], today: datetime) -> Points:
+        """Keep published spot prices and return those of the current month."""
+        monthStart = today.replace(day=1)
+        # Published prices never change, so every returned day is final
+        end = today + timedelta(days=3)
+        self.cache.update("spot_price", response["data"], "price", end)
+        self.cache.prune("spot_price", monthStart)
+        return parse_points(
+            self.cache.merge("spot_price", monthStart, end, {}, "price"), "price"
+        )
+
+    async def _async_update_costs(
+        self,
+        data: GreenelyCoordinatorData,
+        hourly_usage: Points,
+        today: datetime,
+        cutoff: datetime,
+    ) -> None:
+        """Price new usage hours locally, reconcile with Greenely occasionally."""
+        now = datetime.now()
+        reconciled_at = self._costs_reconciled_at
+        if (
+            reconciled_at is None
+            or now - reconciled_at >= COST_RECONCILE_INTERVAL
+            or reconciled_at.month != now.month
+        ):
+            _LOGGER.debug("Reconciling month to date cost...")
+            try:
+                response = await self.api.get_price_data()
+            except httpx.HTTPError as err:
+                # The local totals stay usable, try again on the next update
+                _LOGGER.warning("Unable to reconcile month to date cost: %s", err)
+            else:
+                self.costs.reconcile(response)
+                self._costs_reconciled_at = now
+
+        self.costs.prune(today.replace(day=1).date())
+        self.costs.update(hourly_usage, self._month_spot_price)
+        data.cost_today = self.costs.day_total(today.date())
+        data.cost_month = self.costs.month_total(today.date(), cutoff.date())
+
+    async def _async_fetch_spot_price(self) -> dict[str, Any] | None:
+        """Fetch spot prices only when new ones can have been published."""
+        now = datetime.now()
+        previous = self._spot_price_response
+        if previous and not self.spot_price_schedule.due(now):
+            _LOGGER.debug(
+                "Reusing spot prices until %s", self.spot_price_schedule.next_fetch
+            )
+            return previous
+
+        try:
+            response = await self.api.get_spot_price(self.spot_price_resolution)
+        except httpx.HTTPError:
+            self.spot_price_schedule.failed(now)
+            raise
+        if not response:
+            self.spot_price_schedule.failed(now)
+            return previous
+
+        tomorrow = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+        has_next_day = any(
+            point["localtime"].startswith(tomorrow) and point["price"] is not None
+            for point in response["data"].values()
+        )
+        self.spot_price_schedule.fetched(now, has_next_day)
+        return response
+
+    async def _async_fetch_history(
+        self,
+        series: str,
+        value_key: str,
+        startDate: datetime,
+        endDate: datetime,
+        cutoff: datetime,
+        fetch: Callable[[datetime, datetime, int], Awaitable[dict[str, Any]]],
+    ) -> Points:
+        """Fetch only the days of a window that are not cached as finalized."""
+        filled = await self._async_refetch_gaps(
+            series, value_key, startDate, cutoff, fetch
+        )
+        fetchFrom = self.cache.first_missing_day(series, startDate, cutoff)
+        _LOGGER.debug("Serving %s from cache until %s", series, fetchFrom)
+        # Days older than the cutoff are only missing while backfilling
+        priority = PRIORITY_BACKFILL if fetchFrom < cutoff else PRIORITY_DEFAULT
+        response = await fetch(fetchFrom, endDate, priority)
+        window = (startDate, fetchFrom, endDate, cutoff)
+        previous = self._history.get(series)
+        if (
+            not filled
+            and previous
+            and previous[0] == window
+            and previous[1] is response
+        ):
+            # The api returns the same object when nothing changed
+            return previous[2]
+        self.cache.update(series, response, value_key, cutoff)
+        self.cache.prune(series, startDate)
+        points = parse_points(
+            self.cache.merge(series, startDate, fetchFrom, response, value_key),
+            value_key,
+        )
+        self._history[series] = (window, response, points)
+        return points
+
+    async def _async_refetch_gaps(
+        self,
+        series: str,
+        value_key: str,
+        startDate: datetime,
+        cutoff: datetime,
+        fetch: Callable[[datetime, datetime, int], Awaitable[dict[str, Any]]],
+    ) -> bool:
+        """Fetch cached days with missing values again, each on its own.
+
+        Returns whether values were filled in. A failure is left for the
+        next retry of the gap instead of failing the refresh.
+        """
+        filled = False
+        for day in self.cache.due_gaps(series, startDate):
+            _LOGGER.debug("Fetching the missing values of %s %s", series, day)
+            try:
+                response = await fetch(day, day + timedelta(days=1), PRIORITY_BACKFILL)
+            except httpx.HTTPError as err:
+                _LOGGER.debug("Unable to fetch %s %s: %s", series, day, err)
+                continue
+            filled |= self.cache.update(series, response, value_key, cutoff)
+        return filled
+
+    def _to_series(self, name: str, points: Points, step: float) -> Series:
+        """Convert fetched points, unchanged points keep their series."""
+        previous = self._series.get(name)
+        if previous is not None and previous[0] is points:
+            return previous[1]
+        series = Series.from_points(points, step)
+        self._series[name] = (points, series)
+        return series
+
+    def _history_points(self, series: str) -> Points | None:
+        previous = self._history.get(series)
+        return previous[2] if previous else None
+
+
+class GreenelyFacilities:
+    """Refresh the coordinators of all facilities of one login together.
+
+    The facilities share the api session, so the login happens once and
+    the per facility requests run concurrently, a refresh takes about as
+    long as the slowest facility.
+    """
+
+    def __init__(
+        self,
+        coordinators: list[GreenelyDataUpdateCoordinator],
+        snapshot: GreenelySnapshot | None = None,
+    ) -> None:
+        self.coordinators = coordinators
+        self.snapshot = snapshot
+        self._saved_data: list[GreenelyCoordinatorData | None] = []
+        self._semaphore = asyncio.Semaphore(FACILITY_REFRESH_CONCURRENCY)
+
+    async def _async_refresh_one(
+        self, coordinator: GreenelyDataUpdateCoordinator, first: bool
+    ) -> None:
+        async with self._semaphore:
+            if first:
+                await coordinator.async_config_entry_first_refresh()
+            else:
+                await coordinator.async_refresh()
+
+    async def async_config_entry_first_refresh(self) -> None:
+        """Do the first refresh of every facility, raising if any fails."""
+        await asyncio.gather(
+            *(self._async_refresh_one(c, True) for c in self.coordinators)
+        )
+        self._async_save_snapshot()
+
+    async def async_refresh(self, now: datetime | None = None) -> None:
+        """Refresh every facility, failures are tracked per coordinator."""
+        metrics = self.coordinators[0].api.metrics
+        started = metrics.cycle_started()
+        await asyncio.gather(
+            *(self._async_refresh_one(c, False) for c in self.coordinators)
+        )
+        metrics.cycle_finished(started)
+        primary = self.coordinators[0]
+        async_dispatcher_send(
+            primary.hass, SIGNAL_API_METRICS.format(primary.api.facility_id)
+        )
+        self._async_save_snapshot()
+
+    def _async_save_snapshot(self) -> None:
+        data = [c.data for c in self.coordinators]
+        if self.snapshot is None or (
+            len(data) == len(self._saved_data)
+            and all(new is old for new, old in zip(data, self._saved_data))
+        ):
+            # Unchanged refreshes keep the data object, nothing new to save
+            return
+        self._saved_data = data
+        self.snapshot.async_schedule_save(self.coordinators)
+
+
+def _to_kilo(points: Points) -> Points:
+    return [
+        (moment, value / 1000 if value is not None else None)
+        for moment, value in points
+    ]
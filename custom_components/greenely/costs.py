@@ -0,0 +1,80 @@
+"""Electricity cost computed locally from hourly usage and spot prices."""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any
+
+from .parsing import Points, hourly_means
+
+
+class CostEngine:
+    """Running day totals of usage times spot price, plus fees and markup.
+
+    Each hour is priced once and only priced again if its usage or price
+    changes, the day totals are adjusted by the difference. Days reported
+    by the currency endpoint replace the local totals once they are final,
+    so the month total converges to what Greenely bills.
+    """
+
+    def __init__(self, fee: float, markup: float) -> None:
+        # fee in SEK/kWh, markup in percent of the spot price
+        self._fee = fee
+        self._factor = 1 + markup / 100
+        self._hours: dict[datetime, tuple[Any, Any, float]] = {}
+        self._days: dict[date, float] = {}
+        self._remote: dict[date, float] = {}
+
+    def update(self, usage: Points, prices: Points) -> None:
+        """Price the hours that are new or changed since the last update."""
+        price_at = dict(hourly_means(prices))
+        for hour, used in usage:
+            price = price_at.get(hour)
+            if used is None or price is None:
+                continue
+            previous = self._hours.get(hour)
+            if previous is not None and previous[0] == used and previous[1] == price:
+                continue
+            # Usage is in Wh and prices in 1/100000 SEK per kWh
+            cost = used / 1000 * (price / 100000 * self._factor + self._fee)
+            day = hour.date()
+            self._days[day] = (
+                self._days.get(day, 0.0) + cost - (previous[2] if previous else 0.0)
+            )
+            self._hours[hour] = (used, price, cost)
+
+    def reconcile(self, response: dict[str, Any]) -> None:
+        """Take the per day costs reported by the currency endpoint."""
+        for point in response.values():
+            cost = point["cost"]
+            if cost is not None:
+                self._remote[date.fromisoformat(point["localtime"][:10])] = (
+                    cost / 100000
+                )
+
+    def day_total(self, day: date) -> float | None:
+        return self._days.get(day)
+
+    def month_total(self, today: date, cutoff: date) -> float:
+        """Month to date cost, reported days before cutoff win over local ones."""
+        month_start = today.replace(day=1)
+        days = {
+            day
+            for day in self._days.keys() | self._remote.keys()
+            if month_start <= day <= today
+        }
+        total = 0.0
+        for day in days:
+            if day in self._remote and (day < cutoff or day not in self._days):
+                total += self._remote[day]
+            else:
+                total += self._days[day]
+        return total
+
+    def prune(self, start: date) -> None:
+        """Forget hours and days before start."""
+        self._hours = {
+            hour: value for hour, value in self._hours.items() if hour.date() >= start
+        }
+        self._days = {day: cost for day, cost in self._days.items() if day >= start}
+        self._remote = {day: cost for day, cost in self._remote.items() if day >= start}
@@ -0,0 +1,37 @@
+"""Diagnostics support for Greenely."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_EMAIL, CONF_PASSWORD
+from homeassistant.core import HomeAssistant
+
+from . import GreenelyConfigEntry
+
+TO_REDACT = {CONF_EMAIL, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: GreenelyConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = entry.runtime_data
+    limiter = data.api.limiter
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "facilities": {
+            coordinator.api.facility_id: {
+                "last_update_success": coordinator.last_update_success,
+                "next_spot_price_fetch": coordinator.spot_price_schedule.next_fetch,
+            }
+            for coordinator in data.coordinators
+        },
+        "rate_limit": limiter.as_dict() if limiter is not None else None,
+        "circuit_breaker": data.api.breaker.state,
+        "api": data.api.metrics.as_dict(),
+    }
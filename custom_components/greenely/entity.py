@@ -0,0 +1,75 @@
+"""Base entity for the Greenely integration."""
+
+from __future__ import annotations
+
+from abc import abstractmethod
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .coordinator import GreenelyDataUpdateCoordinator
+
+
+class GreenelyEntity(CoordinatorEntity[GreenelyDataUpdateCoordinator]):
+    """Coordinator entity that only writes its state when it changed.
+
+    Attributes are rebuilt only when the inputs of the entity changed, and
+    the state is written only when the state, an attribute or the
+    availability differs from what was written last. An unchanged refresh
+    therefore causes no recorder insert, websocket message or template
+    update.
+    """
+
+    _written: tuple[Any, ...] | None = None
+    _rendered_inputs: tuple[Any, ...] | None = None
+
+    def _inputs(self) -> tuple[Any, ...] | None:
+        """Return what the state and attributes are built from.
+
+        The coordinator keeps unchanged series, so they usually compare by
+        identity. None means always rebuild.
+        """
+        return None
+
+    @abstractmethod
+    def _update_from_coordinator(self) -> None:
+        """Build the state and attributes from the coordinator data."""
+
+    def _render(self) -> None:
+        """Build the state and attributes if the inputs changed."""
+        inputs = self._inputs()
+        rendered = self._rendered_inputs
+        if (
+            inputs is None
+            or rendered is None
+            or len(inputs) != len(rendered)
+            or any(new is not old and new != old for new, old in zip(inputs, rendered))
+        ):
+            self._update_from_coordinator()
+            self._rendered_inputs = inputs
+
+    def _fingerprint(self) -> tuple[Any, ...]:
+        # A shallow copy, unchanged attribute lists compare by identity
+        return (self.available, self.state, dict(self.extra_state_attributes or {}))
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # The data may have been refreshed since the entity was created
+        self._render()
+        # Home Assistant writes the state right after this
+        self._written = self._fingerprint()
+
+    @callback
+    def async_write_if_changed(self) -> None:
+        """Write the state unless it is the same as the last written one."""
+        fingerprint = self._fingerprint()
+        if fingerprint == self._written:
+            return
+        self._written = fingerprint
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._render()
+        self.async_write_if_changed()
@@ -0,0 +1,90 @@
+"""Conditional requests and unchanged response detection for the Greenely API."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+from importlib.util import find_spec
+from typing import Any
+
+import httpx
+
+from .const import API_RESPONSE_CACHE_SIZE
+from .resilience import GreenelyApiError
+
+
+def accept_encoding() -> str:
+    """Return the encodings httpx can decode here, brotli needs a package."""
+    encodings = ["gzip", "deflate"]
+    if find_spec("brotli") or find_spec("brotlicffi"):
+        encodings.insert(0, "br")
+    return ", ".join(encodings)
+
+
+class CachedResponse:
+    """Validators, body digest and parsed payload of a response."""
+
+    __slots__ = ("etag", "last_modified", "digest", "payload")
+
+    def __init__(
+        self,
+        etag: str | None,
+        last_modified: str | None,
+        digest: bytes,
+        payload: Any,
+    ) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.payload = payload
+
+
+class ResponseCache:
+    """The last response of recently requested urls.
+
+    Requests for a known url carry its ETag and Last-Modified, a 304
+    answer returns the payload parsed last time. Without validators the
+    body is hashed instead, an identical body is not parsed again. Either
+    way the caller gets the very same payload object as before, so it can
+    tell an unchanged response by identity and skip its own work too.
+    """
+
+    def __init__(self, size: int = API_RESPONSE_CACHE_SIZE) -> None:
+        self._size = size
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def validators(self, url: str) -> dict[str, str]:
+        """Return the conditional request headers for a url."""
+        entry = self._entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def resolve(self, url: str, response: httpx.Response) -> tuple[Any, bool]:
+        """Return the payload of a 200 or 304 response and if it is unchanged."""
+        entry = self._entries.get(url)
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            if entry is None:
+                raise GreenelyApiError("Not modified without a cached response")
+            self._entries.move_to_end(url)
+            return entry.payload, True
+
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if entry is not None and entry.digest == digest:
+            entry.etag = etag
+            entry.last_modified = last_modified
+            self._entries.move_to_end(url)
+            return entry.payload, True
+
+        payload = response.json()
+        self._entries[url] = CachedResponse(etag, last_modified, digest, payload)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+        return payload, False
@@ -0,0 +1,114 @@
+"""Request metrics of a Greenely login session."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import time
+from typing import Any
+
+from .const import METRICS_LATENCY_BUCKETS
+
+
+class EndpointMetrics:
+    """Counters and a latency histogram for one endpoint."""
+
+    __slots__ = (
+        "requests",
+        "errors",
+        "retries",
+        "unchanged",
+        "bytes",
+        "latency",
+        "buckets",
+    )
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        # 304 answers and bodies identical to the previous one
+        self.unchanged = 0
+        self.bytes = 0
+        self.latency = 0.0
+        # One count per bucket upper bound, plus one for slower requests
+        self.buckets = [0] * (len(METRICS_LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency: float, size: int, error: bool) -> None:
+        self.requests += 1
+        self.errors += error
+        self.bytes += size
+        self.latency += latency
+        self.buckets[bisect_left(METRICS_LATENCY_BUCKETS, latency)] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        bounds = [str(bound) for bound in METRICS_LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "unchanged": self.unchanged,
+            "bytes": self.bytes,
+            "latency_mean_ms": (
+                round(self.latency / self.requests * 1000, 1) if self.requests else None
+            ),
+            "latency_buckets": dict(zip(bounds, self.buckets)),
+        }
+
+
+class ApiMetrics:
+    """Per endpoint metrics, logins and refresh cycle cost of a session."""
+
+    def __init__(self) -> None:
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.logins = 0
+        self.token_issued_at: float | None = None
+        self.last_cycle: dict[str, Any] | None = None
+
+    def endpoint(self, name: str) -> EndpointMetrics:
+        metrics = self.endpoints.get(name)
+        if metrics is None:
+            metrics = self.endpoints[name] = EndpointMetrics()
+        return metrics
+
+    def logged_in(self) -> None:
+        self.logins += 1
+        self.token_issued_at = time.time()
+
+    @property
+    def token_age(self) -> float | None:
+        if self.token_issued_at is None:
+            return None
+        return time.time() - self.token_issued_at
+
+    def total(self, counter: str) -> int:
+        return sum(getattr(metrics, counter) for metrics in self.endpoints.values())
+
+    @property
+    def latency_mean(self) -> float | None:
+        requests = self.total("requests")
+        if not requests:
+            return None
+        return sum(m.latency for m in self.endpoints.values()) / requests
+
+    def cycle_started(self) -> tuple[float, int, int]:
+        return time.monotonic(), self.total("requests"), self.total("bytes")
+
+    def cycle_finished(self, started: tuple[float, int, int]) -> None:
+        """Record what one refresh of all facilities cost."""
+        start, requests, size = started
+        self.last_cycle = {
+            "duration_ms": round((time.monotonic() - start) * 1000, 1),
+            "requests": self.total("requests") - requests,
+            "bytes": self.total("bytes") - size,
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        token_age = self.token_age
+        return {
+            "logins": self.logins,
+            "token_age_s": round(token_age) if token_age is not None else None,
+            "last_cycle": self.last_cycle,
+            "endpoints": {
+                name: metrics.as_dict() for name, metrics in self.endpoints.items()
+            },
+        }
@@ -0,0 +1,70 @@
+"""Parsing and formatting of Greenely payload timestamps."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from operator import itemgetter
+from typing import Any
+
+# Every data point carries its local time as "YYYY-MM-DD HH:MM"
+type Points = list[tuple[datetime, Any]]
+
+
+def parse_points(response: dict[str, Any] | None, value_key: str) -> Points:
+    """Parse an API ``data`` mapping once into (local time, value) pairs.
+
+    fromisoformat accepts the fixed "YYYY-MM-DD HH:MM" layout and is an
+    order of magnitude faster than strptime with an explicit format.
+    """
+    if not response:
+        return []
+    return sorted(
+        (
+            (datetime.fromisoformat(point["localtime"]), point[value_key])
+            for point in response.values()
+        ),
+        key=itemgetter(0),
+    )
+
+
+class DateTimeFormatter:
+    """strftime for the configured formats, cached per day and time of day.
+
+    A year of hourly points only has 365 distinct days and 24 distinct
+    times, so the strings are formatted once and looked up after that.
+    """
+
+    __slots__ = ("_date_format", "_time_format", "_dates", "_times")
+
+    def __init__(self, date_format: str, time_format: str) -> None:
+        self._date_format = date_format
+        self._time_format = time_format
+        self._dates: dict[date, str] = {}
+        self._times: dict[time, str] = {}
+
+    def date(self, moment: datetime) -> str:
+        day = moment.date()
+        formatted = self._dates.get(day)
+        if formatted is None:
+            formatted = self._dates[day] = day.strftime(self._date_format)
+        return formatted
+
+    def time(self, moment: datetime) -> str:
+        time_of_day = moment.time()
+        formatted = self._times.get(time_of_day)
+        if formatted is None:
+            formatted = self._times[time_of_day] = time_of_day.strftime(
+                self._time_format
+            )
+        return formatted
+
+
+def hourly_means(points: Points) -> Points:
+    """Average sub-hourly points per hour, None if any slot is missing a value."""
+    hours: dict[datetime, list[Any]] = {}
+    for moment, value in points:
+        hours.setdefault(moment.replace(minute=0), []).append(value)
+    return [
+        (hour, None if None in values else sum(values) / len(values))
+        for hour, values in hours.items()
+    ]
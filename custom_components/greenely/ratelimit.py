@@ -0,0 +1,99 @@
+"""Client side request budget for a Greenely account."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+from itertools import count
+import time
+from typing import Any
+
+from .const import PRIORITY_BACKFILL, RATE_LIMIT_BURST, RATE_LIMIT_RESERVE
+
+
+class RateLimiter:
+    """Token bucket that hands out requests by priority.
+
+    The bucket refills at budget requests per hour up to a small burst.
+    Waiting requests are served lowest priority value first, and backfill
+    requests leave a reserve in the bucket, so prices are not held up
+    behind a long history import.
+    """
+
+    def __init__(self, budget: int) -> None:
+        self._tokens = 0.0
+        self._capacity = 1
+        self._rate = 0.0
+        self._updated = time.monotonic()
+        self._waiters: list[tuple[int, int]] = []
+        self._counter = count()
+        self._changed = asyncio.Event()
+        self.granted = 0
+        self.configure(budget)
+        self._tokens = float(self._capacity)
+
+    def configure(self, budget: int) -> None:
+        """Set the budget in requests per hour."""
+        self._refill()
+        self.budget = max(budget, 1)
+        self._rate = self.budget / 3600
+        self._capacity = min(self.budget, RATE_LIMIT_BURST)
+        self._tokens = min(self._tokens, self._capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _required(self, priority: int) -> float:
+        if priority >= PRIORITY_BACKFILL:
+            # A full bucket is always enough, however small the budget
+            return min(self._capacity, 1 + self._capacity * RATE_LIMIT_RESERVE)
+        return 1
+
+    async def acquire(self, priority: int) -> None:
+        """Wait until a request of this priority may be sent."""
+        entry = (priority, next(self._counter))
+        heapq.heappush(self._waiters, entry)
+        self._notify()
+        try:
+            while True:
+                self._refill()
+                delay = None
+                if self._waiters[0] == entry:
+                    missing = self._required(priority) - self._tokens
+                    if missing <= 0:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self.granted += 1
+                        self._notify()
+                        return
+                    delay = missing / self._rate
+                changed = self._changed
+                try:
+                    async with asyncio.timeout(delay):
+                        await changed.wait()
+                except TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+
+    def as_dict(self) -> dict[str, Any]:
+        self._refill()
+        return {
+            "budget_per_hour": self.budget,
+            "capacity": self._capacity,
+            "remaining": round(self._tokens, 2),
+            "granted": self.granted,
+            "waiting": len(self._waiters),
+        }
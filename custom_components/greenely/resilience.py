@@ -0,0 +1,118 @@
+"""Retries, backoff and circuit breaking for calls to the Greenely API."""
+
+from __future__ import annotations
+
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import time
+
+import httpx
+
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_OPEN_MAX,
+    BREAKER_OPEN_MIN,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = frozenset(
+    {
+        httpx.codes.TOO_MANY_REQUESTS,
+        httpx.codes.INTERNAL_SERVER_ERROR,
+        httpx.codes.BAD_GATEWAY,
+        httpx.codes.SERVICE_UNAVAILABLE,
+        httpx.codes.GATEWAY_TIMEOUT,
+    }
+)
+
+
+class GreenelyApiError(httpx.HTTPError):
+    """A Greenely call that failed after its retries.
+
+    Derived from httpx.HTTPError so it is handled wherever transport
+    errors already are.
+    """
+
+
+class CircuitOpenError(GreenelyApiError):
+    """Calls are blocked because Greenely has been failing."""
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter exponential backoff for the given retry attempt."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2**attempt))
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Return the delay a Retry-After header asks for, in seconds."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Stop calling Greenely while it is down and probe for its recovery.
+
+    After a number of consecutive failed calls the breaker opens and every
+    call fails fast. Once the open period has passed a single call is let
+    through as a probe: success closes the breaker, failure opens it again
+    for twice as long.
+    """
+
+    __slots__ = ("_failures", "_open_until", "_open_for", "_probing")
+
+    def __init__(self) -> None:
+        self._failures = 0
+        self._open_until: float | None = None
+        self._open_for = BREAKER_OPEN_MIN
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._open_until is None:
+            return "closed"
+        if self._probing or time.monotonic() >= self._open_until:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise if calls are blocked, otherwise let the call through."""
+        if self._open_until is None:
+            return
+        now = time.monotonic()
+        if now < self._open_until:
+            raise CircuitOpenError("Greenely is unavailable, not calling it for now")
+        _LOGGER.debug("Probing whether Greenely has recovered")
+        self._probing = True
+        # Block other calls while the probe runs, or until it is given up on
+        self._open_until = now + self._open_for
+
+    def success(self) -> None:
+        if self._open_until is not None:
+            _LOGGER.info("Greenely has recovered")
+        self._failures = 0
+        self._open_until = None
+        self._open_for = BREAKER_OPEN_MIN
+        self._probing = False
+
+    def failure(self, open_for: float | None = None) -> None:
+        """Count a failed call, open_for is a delay the server asked for."""
+        self._failures += 1
+        if self._probing:
+            self._open_for = min(self._open_for * 2, BREAKER_OPEN_MAX)
+        elif self._failures < BREAKER_FAILURE_THRESHOLD and open_for is None:
+            return
+        self._probing = False
+        delay = max(self._open_for, min(open_for or 0, BREAKER_OPEN_MAX))
+        _LOGGER.warning("Greenely is failing, pausing calls for %s seconds", delay)
+        self._open_until = time.monotonic() + delay
@@ -0,0 +1,53 @@
+"""Refresh scheduling for the Greenely day-ahead spot prices."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from .const import (
+    SPOT_PRICE_PUBLISH_TIME,
+    SPOT_PRICE_RETRY_MAX,
+    SPOT_PRICE_RETRY_MIN,
+)
+
+
+class SpotPriceSchedule:
+    """Decide when the spot prices have to be fetched again.
+
+    Day-ahead prices are published once a day, so after a fetch that
+    already contains tomorrow there is nothing new until the next
+    publication window. Inside the window the fetch is retried with an
+    exponential backoff until tomorrow's prices show up.
+    """
+
+    def __init__(self) -> None:
+        self._next_fetch: datetime | None = None
+        self._retries = 0
+
+    @property
+    def next_fetch(self) -> datetime | None:
+        return self._next_fetch
+
+    def due(self, now: datetime) -> bool:
+        return self._next_fetch is None or now >= self._next_fetch
+
+    def fetched(self, now: datetime, has_next_day: bool) -> None:
+        """Plan the next fetch after a successful one."""
+        publication = datetime.combine(now.date(), SPOT_PRICE_PUBLISH_TIME)
+        if has_next_day:
+            self._retries = 0
+            self._next_fetch = publication + timedelta(days=1)
+        elif now < publication:
+            self._retries = 0
+            self._next_fetch = publication
+        else:
+            self._backoff(now)
+
+    def failed(self, now: datetime) -> None:
+        """Plan a retry after a failed fetch."""
+        self._backoff(now)
+
+    def _backoff(self, now: datetime) -> None:
+        delay = min(SPOT_PRICE_RETRY_MIN * 2**self._retries, SPOT_PRICE_RETRY_MAX)
+        self._retries += 1
+        self._next_fetch = now + delay
@@ -2,35 +2,81 @@ from datetime import datetime, timedelta
 import logging
 
 from homeassistant.components.sensor import SensorDeviceClass
-from homeassistant.const import UnitOfEnergy
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfEnergy, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
-from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 from . import GreenelyData
+from .entity import GreenelyEntity
+from .parsing import DateTimeFormatter
+from .series import DAY, HOUR, Series
 from .const import (
     DOMAIN,
-    GREENELY_DAILY_PRODUCED_ELECTRICITY,
-    GREENELY_DAILY_USAGE,
     GREENELY_DATE_FORMAT,
+    GREENELY_DIAGNOSTIC_SENSORS,
     GREENELY_HOMEKIT_COMPATIBLE,
-    GREENELY_HOURLY_OFFSET_DAYS,
-    GREENELY_HOURLY_USAGE,
-    GREENELY_PRICES,
-    GREENELY_PRODUCED_ELECTRICITY_DAYS,
     GREENELY_TIME_FORMAT,
-    GREENELY_USAGE_DAYS,
     GREENELY_FACILITY_ID,
+    SENSOR_API_ERRORS_NAME,
+    SENSOR_API_LATENCY_NAME,
+    SENSOR_API_LOGINS_NAME,
+    SENSOR_API_REQUESTS_NAME,
+    SENSOR_API_TOKEN_AGE_NAME,
     SENSOR_DAILY_PRODUCED_ELECTRICITY_NAME,
     SENSOR_DAILY_USAGE_NAME,
     SENSOR_HOURLY_USAGE_NAME,
     SENSOR_PRICES_NAME,
+    SIGNAL_API_METRICS,
 )
 
-SCAN_INTERVAL = timedelta(minutes=10)
-
 _LOGGER = logging.getLogger(__name__)
 
+# History lists are large and only useful for the current state
+HISTORY_ATTRIBUTES = frozenset({"data"})
+PRICE_ATTRIBUTES = frozenset({"current_day", "next_day", "previous_day"})
+
+# name, icon, unit and value of each api metric sensor
+API_METRIC_SENSORS = {
+    "requests": (
+        SENSOR_API_REQUESTS_NAME,
+        "mdi:swap-vertical",
+        None,
+        lambda metrics: metrics.total("requests"),
+    ),
+    "errors": (
+        SENSOR_API_ERRORS_NAME,
+        "mdi:alert-circle-outline",
+        None,
+        lambda metrics: metrics.total("errors"),
+    ),
+    "latency": (
+        SENSOR_API_LATENCY_NAME,
+        "mdi:timer-outline",
+        UnitOfTime.MILLISECONDS,
+        lambda metrics: (
+            round(metrics.latency_mean * 1000, 1)
+            if metrics.latency_mean is not None
+            else None
+        ),
+    ),
+    "logins": (
+        SENSOR_API_LOGINS_NAME,
+        "mdi:login",
+        None,
+        lambda metrics: metrics.logins,
+    ),
+    "token_age": (
+        SENSOR_API_TOKEN_AGE_NAME,
+        "mdi:key-clock",
+        UnitOfTime.SECONDS,
+        lambda metrics: (
+            round(metrics.token_age) if metrics.token_age is not None else None
+        ),
+    ),
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -38,71 +84,76 @@ async def async_setup_entry(
     async_add_entities,
 ):
     """Setup sensors from a config entry created in the integrations UI."""
-    api = config_entry.runtime_data.api
     facility_id = str(config_entry.options.get(GREENELY_FACILITY_ID))
-    usage_days = config_entry.options.get(GREENELY_USAGE_DAYS, 10)
-    production_days = config_entry.options.get(GREENELY_PRODUCED_ELECTRICITY_DAYS, 10)
-    hourly_offset_days = config_entry.options.get(GREENELY_HOURLY_OFFSET_DAYS, 1)
+    suffix = ""
     date_format = config_entry.options.get(GREENELY_DATE_FORMAT, "%b %d %Y")
     time_format = config_entry.options.get(GREENELY_TIME_FORMAT, "%H:%M")
     homekit_compatible = config_entry.options.get(GREENELY_HOMEKIT_COMPATIBLE, False)
+    formatter = DateTimeFormatter(date_format, time_format)
 
     sensors = []
 
-    api.set_facility_id(facility_id)
-
-    if config_entry.data.get(GREENELY_DAILY_USAGE, True):
-        sensors.append(
-            GreenelyDailyUsageSensor(
-                SENSOR_DAILY_USAGE_NAME,
-                api,
-                facility_id,
-                usage_days,
-                date_format,
-                time_format,
+    for coordinator in config_entry.runtime_data.coordinators:
+        if coordinator is not config_entry.runtime_data.coordinator:
+            # Extra facilities of the login get the facility id in their names
+            facility_id = coordinator.api.facility_id
+            suffix = f" {facility_id}"
+
+        if coordinator.daily_usage:
+            sensors.append(
+                GreenelyDailyUsageSensor(
+                    SENSOR_DAILY_USAGE_NAME + suffix,
+                    coordinator,
+                    facility_id,
+                    formatter,
+                )
             )
-        )
-    if config_entry.data.get(GREENELY_PRICES, True):
-        sensors.append(
-            GreenelyPricesSensor(
-                SENSOR_PRICES_NAME,
-                api,
-                facility_id,
-                date_format,
-                time_format,
-                homekit_compatible,
+        if coordinator.prices:
+            sensors.append(
+                GreenelyPricesSensor(
+                    SENSOR_PRICES_NAME + suffix,
+                    coordinator,
+                    facility_id,
+                    formatter,
+                    homekit_compatible,
+                )
             )
-        )
 
-    if config_entry.options.get(GREENELY_HOURLY_USAGE, False):
-        sensors.append(
-            GreenelyHourlyUsageSensor(
-                SENSOR_HOURLY_USAGE_NAME,
-                api,
-                facility_id,
-                hourly_offset_days,
-                date_format,
-                time_format,
+        if coordinator.hourly_usage:
+            sensors.append(
+                GreenelyHourlyUsageSensor(
+                    SENSOR_HOURLY_USAGE_NAME + suffix,
+                    coordinator,
+                    facility_id,
+                    formatter,
+                )
             )
-        )
 
-    if config_entry.options.get(GREENELY_DAILY_PRODUCED_ELECTRICITY, False):
-        sensors.append(
-            GreenelyDailyProducedElecticitySensor(
-                SENSOR_DAILY_PRODUCED_ELECTRICITY_NAME,
-                api,
-                facility_id,
-                production_days,
-                date_format,
-                time_format,
+        if coordinator.produced_electricity:
+            sensors.append(
+                GreenelyDailyProducedElecticitySensor(
+                    SENSOR_DAILY_PRODUCED_ELECTRICITY_NAME + suffix,
+                    coordinator,
+                    facility_id,
+                    formatter,
+                )
             )
-        )
 
-    async_add_entities(sensors, True)
+    if config_entry.options.get(GREENELY_DIAGNOSTIC_SENSORS, False):
+        # The metrics belong to the login, which all facilities share
+        coordinator = config_entry.runtime_data.coordinator
+        facility_id = str(config_entry.options.get(GREENELY_FACILITY_ID))
+        for key in API_METRIC_SENSORS:
+            sensors.append(GreenelyApiMetricSensor(key, coordinator, facility_id))
 
+    async_add_entities(sensors)
 
-class GreenelyDailyUsageSensor(Entity):
-    def __init__(self, name, api, facility_id, usage_days, date_format, time_format):
+
+class GreenelyDailyUsageSensor(GreenelyEntity):
+    _unrecorded_attributes = HISTORY_ATTRIBUTES
+
+    def __init__(self, name, coordinator, facility_id, formatter):
+        super().__init__(coordinator)
         self._name = name
         self._icon = "mdi:lightning-bolt"
         self._state = 0
@@ -111,12 +162,10 @@ class GreenelyDailyUsageSensor(Entity):
             "last_reset": "1970-01-01T00:00:00+00:00",
         }
         self._unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-        self._usage_days = usage_days
-        self._date_format = date_format
-        self._time_format = time_format
-        self._api = api
+        self._formatter = formatter
         self._device_class = SensorDeviceClass.ENERGY
         self._facility_id = facility_id
+        self._render()
 
     @property
     def name(self):
@@ -164,42 +213,39 @@ class GreenelyDailyUsageSensor(Entity):
         """Return the class of the sensor."""
         return self._device_class
 
-    def update(self):
-        _LOGGER.debug("Checking jwt validity...")
-        if self._api.check_auth():
-            # Get todays date
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            _LOGGER.debug("Fetching daily usage data...")
-            data = []
-            startDate = today - timedelta(days=self._usage_days)
-            response = self._api.get_usage(startDate, today, False)
-            if response:
-                data = self.make_attributes(today, response)
-            self._state_attributes["data"] = data
-        else:
-            _LOGGER.error("Unable to log in!")
+    def _inputs(self):
+        return (datetime.now().date(), self.coordinator.data.daily_usage)
 
-    def make_attributes(self, today, response):
+    def _update_from_coordinator(self):
+        # Get todays date
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        response = self.coordinator.data.daily_usage or Series(0, DAY)
         yesterday = today - timedelta(days=1)
+        if response.index_at(yesterday) is not None:
+            usage = response.value_at(yesterday)
+            self._state = usage / 1000 if usage != None else 0
+        if not self.coordinator.data_attributes:
+            return
+        if self.coordinator.compact_attributes:
+            self._state_attributes["data"] = response.compact(_to_kilo)
+        else:
+            self._state_attributes["data"] = self.make_attributes(response)
+
+    def make_attributes(self, response):
         data = []
-        keys = iter(response)
-        if keys != None:
-            for k in keys:
-                daily_data = {}
-                dateTime = datetime.strptime(response[k]["localtime"], "%Y-%m-%d %H:%M")
-                daily_data["localtime"] = dateTime.strftime(self._date_format)
-                usage = response[k]["usage"]
-                if dateTime == yesterday:
-                    self._state = usage / 1000 if usage != None else 0
-                daily_data["usage"] = (usage / 1000) if usage != None else 0
-                data.append(daily_data)
+        for dateTime, usage in response:
+            daily_data = {}
+            daily_data["localtime"] = self._formatter.date(dateTime)
+            daily_data["usage"] = (usage / 1000) if usage != None else 0
+            data.append(daily_data)
         return data
 
 
-class GreenelyHourlyUsageSensor(Entity):
-    def __init__(
-        self, name, api, facility_id, hourly_offset_days, date_format, time_format
-    ):
+class GreenelyHourlyUsageSensor(GreenelyEntity):
+    _unrecorded_attributes = HISTORY_ATTRIBUTES
+
+    def __init__(self, name, coordinator, facility_id, formatter):
+        super().__init__(coordinator)
         self._name = name
         self._icon = "mdi:lightning-bolt"
         self._state = 0
@@ -208,12 +254,10 @@ class GreenelyHourlyUsageSensor(Entity):
             "last_reset": "1970-01-01T00:00:00+00:00",
         }
         self._unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-        self._date_format = date_format
-        self._time_format = time_format
-        self._hourly_offset_days = hourly_offset_days
-        self._api = api
+        self._formatter = formatter
         self._device_class = SensorDeviceClass.ENERGY
         self._facility_id = facility_id
+        self._render()
 
     @property
     def name(self):
@@ -261,61 +305,69 @@ class GreenelyHourlyUsageSensor(Entity):
         """Return the class of the sensor."""
         return self._device_class
 
-    def update(self):
-        _LOGGER.debug("Checking jwt validity...")
-        if self._api.check_auth():
-            # Get todays date
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            _LOGGER.debug("Fetching hourly usage data...")
-            data = []
-            startDate = today - timedelta(days=self._hourly_offset_days)
-            response = self._api.get_usage(startDate, today, True)
-            if response:
-                data = self.make_attributes(datetime.now(), response)
-            self._state_attributes["data"] = data
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass, self._handle_time_change, minute=0, second=0
+            )
+        )
+
+    @callback
+    def _handle_time_change(self, now: datetime) -> None:
+        self._update_state(now)
+        self.async_write_if_changed()
+
+    def _update_state(self, now):
+        series = self.coordinator.data.hourly_usage
+        if series is None:
+            return
+        index = series.index_at(now - timedelta(days=1))
+        if index is not None:
+            usage = series.value(index)
+            self._state = usage / 1000 if usage != None else 0
+
+    def _inputs(self):
+        data = self.coordinator.data
+        return (data.hourly_usage,)
+
+    def _update_from_coordinator(self):
+        self._update_state(datetime.now())
+        if not self.coordinator.data_attributes:
+            return
+        response = self.coordinator.data.hourly_usage or Series(0, HOUR)
+        if self.coordinator.compact_attributes:
+            self._state_attributes["data"] = response.compact(_to_kilo)
         else:
-            _LOGGER.error("Unable to log in!")
+            self._state_attributes["data"] = self.make_attributes(response)
 
-    def make_attributes(self, today, response):
-        yesterday = today - timedelta(days=1)
+    def make_attributes(self, response):
         data = []
-        keys = iter(response)
-        if keys != None:
-            for k in keys:
-                hourly_data = {}
-                dateTime = datetime.strptime(response[k]["localtime"], "%Y-%m-%d %H:%M")
-                hourly_data["localtime"] = (
-                    dateTime.strftime(self._date_format)
-                    + " "
-                    + dateTime.strftime(self._time_format)
-                )
-                usage = response[k]["usage"]
-                if (
-                    dateTime.hour == yesterday.hour
-                    and dateTime.day == yesterday.day
-                    and dateTime.month == yesterday.month
-                    and dateTime.year == yesterday.year
-                ):
-                    self._state = usage / 1000 if usage != None else 0
-                hourly_data["usage"] = (usage / 1000) if usage != None else 0
-                data.append(hourly_data)
+        for (day, clock), usage in zip(
+            response.labels(self._formatter), response.to_list()
+        ):
+            hourly_data = {}
+            hourly_data["localtime"] = day + " " + clock
+            hourly_data["usage"] = (usage / 1000) if usage != None else 0
+            data.append(hourly_data)
         return data
 
 
-class GreenelyPricesSensor(Entity):
-    def __init__(
-        self, name, api, facility_id, date_format, time_format, homekit_compatible
-    ):
+class GreenelyPricesSensor(GreenelyEntity):
+    _unrecorded_attributes = PRICE_ATTRIBUTES
+
+    def __init__(self, name, coordinator, facility_id, formatter, homekit_compatible):
+        super().__init__(coordinator)
         self._name = name
         self._icon = "mdi:account-cash"
         self._state = 0
         self._state_attributes = {}
         self._unit_of_measurement = "SEK/kWh" if homekit_compatible != True else "°C"
-        self._date_format = date_format
-        self._time_format = time_format
+        self._formatter = formatter
         self._homekit_compatible = homekit_compatible
-        self._api = api
         self._facility_id = facility_id
+        self._attributes_date = None
+        self._render()
 
     @property
     def name(self):
@@ -358,68 +410,93 @@ class GreenelyPricesSensor(Entity):
             entry_type=DeviceEntryType.SERVICE,
         )
 
-    def update(self):
-        """Update state and attributes."""
-        _LOGGER.debug("Checking jwt validity...")
-        if self._api.check_auth():
-            data = self._api.get_price_data()
-            totalCost = 0
-            if data:
-                for d, value in data.items():
-                    cost = value["cost"]
-                    if cost != None:
-                        totalCost += cost
-                self._state_attributes["current_month"] = round(totalCost / 100000)
-            spot_price_data = self._api.get_spot_price()
-            if spot_price_data:
-                _LOGGER.debug("Fetching daily prices...")
-                today = datetime.now().replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                todaysData = []
-                tomorrowsData = []
-                yesterdaysData = []
-                for d in spot_price_data["data"]:
-                    timestamp = datetime.strptime(
-                        spot_price_data["data"][d]["localtime"], "%Y-%m-%d %H:%M"
-                    )
-                    if timestamp.date() == today.date():
-                        if spot_price_data["data"][d]["price"] != None:
-                            todaysData.append(self.make_attribute(spot_price_data, d))
-                    elif timestamp.date() == (today.date() + timedelta(days=1)):
-                        if spot_price_data["data"][d]["price"] != None:
-                            tomorrowsData.append(
-                                self.make_attribute(spot_price_data, d)
-                            )
-                    elif timestamp.date() == (today.date() - timedelta(days=1)):
-                        if spot_price_data["data"][d]["price"] != None:
-                            yesterdaysData.append(
-                                self.make_attribute(spot_price_data, d)
-                            )
-                self._state_attributes["current_day"] = todaysData
-                self._state_attributes["next_day"] = tomorrowsData
-                self._state_attributes["previous_day"] = yesterdaysData
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # Prices are cached between fetches, so flip the state at each slot
+        # boundary from the cached series instead of waiting for the next poll
+        slot_minutes = self.coordinator.spot_price_step // 60
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass,
+                self._handle_time_change,
+                minute=list(range(0, 60, slot_minutes)),
+                second=0,
+            )
+        )
+
+    @callback
+    def _handle_time_change(self, now: datetime) -> None:
+        if now.date() != self._attributes_date:
+            # The day lists are relative to today, rebuild them at midnight
+            self._render()
         else:
-            _LOGGER.error("Unable to log in!")
-
-    def make_attribute(self, response, value):
-        if response:
-            newPoint = {}
-            today = datetime.now()
-            price = response["data"][value]["price"]
-            dt_object = datetime.strptime(
-                response["data"][value]["localtime"], "%Y-%m-%d %H:%M"
+            self._update_state(now)
+        self.async_write_if_changed()
+
+    def _update_state(self, now):
+        series = self.coordinator.data.spot_price
+        if series is None:
+            return
+        index = series.index_at(now)
+        if index is not None and series.value(index) != None:
+            self._state = self.format_price(series.value(index))
+            self._state_attributes["price_rank"] = (
+                self.coordinator.data.spot_price_windows.ranks[index]
             )
-            newPoint["date"] = dt_object.strftime(self._date_format)
-            newPoint["time"] = dt_object.strftime(self._time_format)
-            if price != None:
-                rounded = self.format_price(price)
-                newPoint["price"] = rounded
-                if dt_object.hour == today.hour and dt_object.day == today.day:
-                    self._state = rounded
-            else:
-                newPoint["price"] = 0
-            return newPoint
+
+    def _inputs(self):
+        data = self.coordinator.data
+        return (
+            datetime.now().date(),
+            data.spot_price,
+            data.cost_today,
+            data.cost_month,
+        )
+
+    def _update_from_coordinator(self):
+        """Update state and attributes."""
+        data = self.coordinator.data
+        if data.cost_month is not None:
+            self._state_attributes["current_month"] = round(data.cost_month)
+        if data.cost_today is not None:
+            self._state_attributes["current_day_cost"] = round(data.cost_today, 2)
+        spot_price_data = self.coordinator.data.spot_price
+        if spot_price_data:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            tomorrow = today + timedelta(days=1)
+            yesterday = today - timedelta(days=1)
+            self._state_attributes["current_day"] = self.make_day_attribute(
+                spot_price_data.slice(today, tomorrow)
+            )
+            self._state_attributes["next_day"] = self.make_day_attribute(
+                spot_price_data.slice(tomorrow, tomorrow + timedelta(days=1))
+            )
+            self._state_attributes["previous_day"] = self.make_day_attribute(
+                spot_price_data.slice(yesterday, today)
+            )
+            self._attributes_date = today.date()
+        self._update_state(datetime.now())
+
+    def make_day_attribute(self, points):
+        if self.coordinator.compact_attributes:
+            return points.compact(self.format_price)
+        return [
+            self.make_attribute(day, clock, price)
+            for (day, clock), price in zip(
+                points.labels(self._formatter), points.to_list()
+            )
+            if price != None
+        ]
+
+    def make_attribute(self, day, clock, price):
+        newPoint = {}
+        newPoint["date"] = day
+        newPoint["time"] = clock
+        if price != None:
+            newPoint["price"] = self.format_price(price)
+        else:
+            newPoint["price"] = 0
+        return newPoint
 
     def format_price(self, price):
         if self._homekit_compatible == True:
@@ -427,32 +504,18 @@ class GreenelyPricesSensor(Entity):
         else:
             return round(((price / 1000) / 100), 4)
 
-    def make_data_attribute(self, name, response, nameOfPriceAttr):
-        if response:
-            points = response.get("points", None)
-            data = []
-            for point in points:
-                price = point[nameOfPriceAttr]
-                if price != None:
-                    newPoint = {}
-                    dt_object = datetime.utcfromtimestamp(point["timestamp"])
-                    newPoint["date"] = dt_object.strftime(self._date_format)
-                    newPoint["time"] = dt_object.strftime(self._time_format)
-                    newPoint["price"] = str(price / 100)
-                    data.append(newPoint)
-            self._state_attributes[name] = data
-
-
-class GreenelyDailyProducedElecticitySensor(Entity):
+
+class GreenelyDailyProducedElecticitySensor(GreenelyEntity):
+    _unrecorded_attributes = HISTORY_ATTRIBUTES
+
     def __init__(
         self,
         name,
-        api,
+        coordinator,
         facility_id,
-        produced_electricity_days,
-        date_format,
-        time_format,
+        formatter,
     ):
+        super().__init__(coordinator)
         self._name = name
         self._icon = "mdi:lightning-bolt"
         self._state = 0
@@ -460,13 +523,11 @@ class GreenelyDailyProducedElecticitySensor(Entity):
             "state_class": "measurement",
             "last_reset": "1970-01-01T00:00:00+00:00",
         }
-        self._produced_electricity_days = produced_electricity_days
         self._unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-        self._date_format = date_format
-        self._time_format = time_format
-        self._api = api
+        self._formatter = formatter
         self._device_class = SensorDeviceClass.ENERGY
         self._facility_id = facility_id
+        self._render()
 
     @property
     def name(self):
@@ -509,39 +570,119 @@ class GreenelyDailyProducedElecticitySensor(Entity):
             entry_type=DeviceEntryType.SERVICE,
         )
 
-    def update(self):
-        _LOGGER.debug("Checking jwt validity...")
-        if self._api.check_auth():
-            # Get todays date
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            _LOGGER.debug("Fetching daily produced electricity data...")
-            data = []
-            startDate = today - timedelta(days=(self._produced_electricity_days - 1))
-            endDate = today + timedelta(days=1)
-            response = self._api.get_produced_electricity(startDate, endDate, False)
-            if response:
-                data = self.make_attributes(today, response)
-            self._state_attributes["data"] = data
+    def _inputs(self):
+        return (datetime.now().date(), self.coordinator.data.produced_electricity)
+
+    def _update_from_coordinator(self):
+        # Get todays date
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        response = self.coordinator.data.produced_electricity or Series(0, DAY)
+        if response.index_at(today) is not None:
+            produced_electricity = response.value_at(today)
+            self._state = (
+                produced_electricity / 1000 if produced_electricity != None else 0
+            )
+        if not self.coordinator.data_attributes:
+            return
+        if self.coordinator.compact_attributes:
+            self._state_attributes["data"] = response.compact(_to_kilo)
         else:
-            _LOGGER.error("Unable to log in!")
+            self._state_attributes["data"] = self.make_attributes(response)
 
-    def make_attributes(self, today, response):
+    def make_attributes(self, response):
         data = []
-        keys = iter(response)
-        if keys != None:
-            for k in keys:
-                daily_data = {}
-                dateTime = datetime.strptime(response[k]["localtime"], "%Y-%m-%d %H:%M")
-                daily_data["localtime"] = dateTime.strftime(self._date_format)
-                produced_electricity = response[k]["value"]
-                if dateTime == today:
-                    self._state = (
-                        produced_electricity / 1000
-                        if produced_electricity != None
-                        else 0
-                    )
-                daily_data["produced_electricity"] = (
-                    (produced_electricity / 1000) if produced_electricity != None else 0
-                )
-                data.append(daily_data)
+        for dateTime, produced_electricity in response:
+            daily_data = {}
+            daily_data["localtime"] = self._formatter.date(dateTime)
+            daily_data["produced_electricity"] = (
+                (produced_electricity / 1000) if produced_electricity != None else 0
+            )
+            data.append(daily_data)
         return data
+
+
+class GreenelyApiMetricSensor(GreenelyEntity):
+    """Request metrics of the entry's login, updated after each refresh."""
+
+    def __init__(self, key, coordinator, facility_id):
+        super().__init__(coordinator)
+        self._key = key
+        self._name, self._icon, self._unit_of_measurement, self._value = (
+            API_METRIC_SENSORS[key]
+        )
+        self._state = None
+        self._state_attributes = {}
+        self._facility_id = facility_id
+        self._render()
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return self._icon
+
+    @property
+    def state(self):
+        """Return the state of the device."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        return self._state_attributes
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit_of_measurement
+
+    @property
+    def entity_category(self):
+        """Return the category of the entity."""
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def unique_id(self):
+        """Return a unique ID."""
+        return self._facility_id + "_api_" + self._key
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            name="Greenely",
+            identifiers={(DOMAIN, self._facility_id)},
+            manufacturer="Greenely",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # The metrics change with every cycle, even when the data does not
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_API_METRICS.format(self.coordinator.api.facility_id),
+                self._handle_coordinator_update,
+            )
+        )
+
+    def _update_from_coordinator(self):
+        """Update state and attributes."""
+        metrics = self.coordinator.api.metrics
+        self._state = self._value(metrics)
+        if self._key == "requests" or self._key == "errors":
+            self._state_attributes = {
+                name: getattr(endpoint, self._key)
+                for name, endpoint in metrics.endpoints.items()
+            }
+        elif self._key == "latency":
+            self._state_attributes = {"last_cycle": metrics.last_cycle}
+
+
+def _to_kilo(value):
+    return value / 1000
@@ -0,0 +1,373 @@
+"""Compact, equally spaced time series shared by the Greenely entities."""
+
+from __future__ import annotations
+
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate, chain, repeat
+import math
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from .parsing import DateTimeFormatter, Points
+
+HOUR = 3600
+DAY = 86400
+
+
+class Series:
+    """Values of consecutive slots in an array of doubles.
+
+    Slot i starts at ``start + i * step`` (epoch seconds) and ``valid``
+    tells which slots have a value. A year of hourly values takes about
+    80 kB, where a list of (datetime, value) tuples takes well over 1 MB.
+
+    Steps of whole days count in calendar days instead, so every slot
+    starts at local midnight also across DST changes. Shorter steps count
+    in real seconds, so the repeated hour when DST ends is a slot of its
+    own.
+    """
+
+    __slots__ = ("start", "step", "values", "valid")
+
+    def __init__(self, start: float, step: float) -> None:
+        self.start = start
+        self.step = step
+        self.values = array("d")
+        self.valid = bytearray()
+
+    @classmethod
+    def from_points(cls, points: Points, step: float) -> Series:
+        """Build a series from sorted points, missing slots are invalid."""
+        if not points:
+            return cls(0.0, step)
+        series = cls(points[0][0].timestamp(), step)
+        if round(series._offset(points[-1][0])) + 1 == len(points):
+            # Nothing missing, every point is the next slot
+            series._extend([value for _, value in points])
+            return series
+        values: list[float] = []
+        valid = bytearray()
+        indices = series._indices(moment for moment, _ in points)
+        for index, (_, value) in zip(indices, points):
+            gap = index - len(values)
+            if gap > 0:
+                values.extend([0.0] * gap)
+                valid.extend(bytes(gap))
+            # A smaller index is a local time repeated when DST ends
+            if value is None:
+                values.append(0.0)
+                valid.append(0)
+            else:
+                values.append(value)
+                valid.append(1)
+        series.values = array("d", values)
+        series.valid = valid
+        return series
+
+    @classmethod
+    def from_response(
+        cls, response: dict[str, Any] | None, value_key: str, step: float
+    ) -> Series:
+        """Build a series straight from an API ``data`` mapping.
+
+        The "YYYY-MM-DD HH:MM" local times sort as strings, so without
+        missing slots only the first and last one are parsed.
+        """
+        if not response:
+            return cls(0.0, step)
+        # Stable, a local time repeated when DST ends keeps the API order
+        points = sorted(
+            ((point["localtime"], point[value_key]) for point in response.values()),
+            key=itemgetter(0),
+        )
+        series = cls(datetime.fromisoformat(points[0][0]).timestamp(), step)
+        last = datetime.fromisoformat(points[-1][0])
+        if round(series._offset(last)) + 1 != len(points):
+            return cls.from_points(
+                [
+                    (datetime.fromisoformat(localtime), value)
+                    for localtime, value in points
+                ],
+                step,
+            )
+        series._extend([value for _, value in points])
+        return series
+
+    @classmethod
+    def from_dict(cls, stored: dict[str, Any]) -> Series:
+        series = cls(stored["start"], stored["step"])
+        series._extend(list(stored["values"]))
+        return series
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"start": self.start, "step": self.step, "values": self.to_list()}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Series):
+            return NotImplemented
+        return (
+            self.start == other.start
+            and self.step == other.step
+            and self.valid == other.valid
+            and self.values == other.values
+        )
+
+    __hash__ = None
+
+    def append(self, value: float | None) -> None:
+        """Add the slot after the last one."""
+        if value is None:
+            self.values.append(0.0)
+            self.valid.append(0)
+        else:
+            self.values.append(value)
+            self.valid.append(1)
+
+    def _extend(self, values: list[float | None]) -> None:
+        """Add a slot for each of values."""
+        if None in values:
+            self.valid.extend(value is not None for value in values)
+            values = [0.0 if value is None else value for value in values]
+        else:
+            self.valid.extend(b"\x01" * len(values))
+        self.values.extend(array("d", values))
+
+    def append_gap(self, count: int) -> None:
+        """Add count slots without a value."""
+        if count > 0:
+            self.values.extend(array("d", bytes(8 * count)))
+            self.valid.extend(bytes(count))
+
+    def value(self, index: int) -> float | None:
+        return self.values[index] if self.valid[index] else None
+
+    def moment(self, index: int) -> datetime:
+        """Return the local start time of a slot."""
+        if self.step % DAY == 0:
+            return datetime.fromtimestamp(self.start) + timedelta(
+                seconds=index * self.step
+            )
+        return datetime.fromtimestamp(self.start + index * self.step)
+
+    def _offset(self, moment: datetime) -> float:
+        """Slots from the start of the series to moment."""
+        if self.step % DAY == 0:
+            delta = moment - datetime.fromtimestamp(self.start)
+            return delta.total_seconds() / self.step
+        return (moment.timestamp() - self.start) / self.step
+
+    def _indices(self, moments: Iterable[datetime]) -> Iterator[int]:
+        """Nearest slot index of each of the sorted local moments.
+
+        Converting a local time to a timestamp is slow. Within a day
+        without a DST change the index follows from the day's first
+        moment, so only the moments of a DST day are converted.
+        """
+        start, step = self.start, self.step
+        if step % DAY == 0:
+            first = datetime.fromtimestamp(start)
+            for moment in moments:
+                yield math.floor((moment - first).total_seconds() / step + 0.5)
+            return
+        day = None
+        for moment in moments:
+            ordinal = moment.toordinal()
+            if ordinal != day:
+                day = ordinal
+                day_start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+                begin = day_start.timestamp()
+                end = (day_start + timedelta(days=1)).timestamp()
+                regular = end - begin == DAY
+                offset = (begin - start) / step + 0.5
+            if regular:
+                seconds = moment.hour * HOUR + moment.minute * 60 + moment.second
+                yield math.floor(offset + seconds / step)
+            else:
+                yield math.floor((moment.timestamp() - start) / step + 0.5)
+
+    def _moments(self) -> Iterator[datetime]:
+        """Local start time of every slot."""
+        delta = timedelta(seconds=self.step)
+        if self.step % DAY == 0:
+            return accumulate(
+                repeat(delta, len(self) - 1), initial=datetime.fromtimestamp(self.start)
+            )
+        return chain.from_iterable(self._run_moments(delta))
+
+    def _runs(self) -> Iterator[tuple[int, int, datetime | None]]:
+        """Split the slots of a sub-day series into runs of at most a day.
+
+        Yields the first index, length and local start of each run. Within
+        a run adding the step gives the local times, converting every slot
+        is slow. The start is None for a run with a DST change or starting
+        in a repeated hour, adding the step would also drop its fold.
+        """
+        fromtimestamp = datetime.fromtimestamp
+        start, step, size = self.start, self.step, len(self)
+        delta = timedelta(seconds=step)
+        chunk = max(int(DAY // step), 1)
+        begin = fromtimestamp(start)
+        for first in range(0, size, chunk):
+            count = min(chunk, size - first)
+            end = fromtimestamp(start + (first + count) * step)
+            if end - begin == count * delta and not begin.fold:
+                yield first, count, begin
+            else:
+                yield first, count, None
+            begin = end
+
+    def _run_moments(self, delta: timedelta) -> Iterator[Iterator[datetime]]:
+        fromtimestamp = datetime.fromtimestamp
+        start, step = self.start, self.step
+        for first, count, begin in self._runs():
+            if begin is not None:
+                yield accumulate(repeat(delta, count - 1), initial=begin)
+            else:
+                yield (
+                    fromtimestamp(start + index * step)
+                    for index in range(first, first + count)
+                )
+
+    def labels(self, formatter: DateTimeFormatter) -> Iterator[tuple[str, str]]:
+        """Yield the formatted local date and time of every slot.
+
+        Cheaper than formatting each start time: within a run only its
+        start is converted, and runs starting at the same time of day share
+        one list of formatted times.
+        """
+        if self.step % DAY == 0:
+            return (
+                (formatter.date(moment), formatter.time(moment))
+                for moment in self._moments()
+            )
+        return chain.from_iterable(self._run_labels(formatter))
+
+    def _run_labels(
+        self, formatter: DateTimeFormatter
+    ) -> Iterator[Iterator[tuple[str, str]]]:
+        fromtimestamp = datetime.fromtimestamp
+        start, step = self.start, self.step
+        clocks: dict[tuple[float, int], list[str]] = {}
+        for first, count, begin in self._runs():
+            if begin is None:
+                moments = [
+                    fromtimestamp(start + index * step)
+                    for index in range(first, first + count)
+                ]
+                yield (
+                    (formatter.date(moment), formatter.time(moment))
+                    for moment in moments
+                )
+                continue
+            midnight = begin.replace(hour=0, minute=0, second=0, microsecond=0)
+            seconds = (begin - midnight).total_seconds()
+            times = clocks.get((seconds, count))
+            if times is None:
+                times = clocks[(seconds, count)] = [
+                    formatter.time(moment)
+                    for moment in accumulate(
+                        repeat(timedelta(seconds=step), count - 1), initial=begin
+                    )
+                ]
+            # A run crosses midnight at most once
+            today = min(count, math.ceil((DAY - seconds) / step))
+            if today == count:
+                yield zip(repeat(formatter.date(begin)), times)
+            else:
+                yield zip(repeat(formatter.date(begin)), times[:today])
+                tomorrow = formatter.date(midnight + timedelta(days=1))
+                yield zip(repeat(tomorrow), times[today:])
+
+    def index_at(self, moment: datetime) -> int | None:
+        """Return the index of the slot covering moment, if any."""
+        if not self.values:
+            return None
+        index = math.floor(self._offset(moment))
+        return index if 0 <= index < len(self) else None
+
+    def value_at(self, moment: datetime) -> float | None:
+        index = self.index_at(moment)
+        return self.value(index) if index is not None else None
+
+    def slice(self, start: datetime, end: datetime) -> Series:
+        """Return the slots that start in [start, end)."""
+        if not self.values:
+            return Series(self.start, self.step)
+        first = min(max(math.ceil(self._offset(start)), 0), len(self))
+        last = min(max(math.ceil(self._offset(end)), first), len(self))
+        series = Series(
+            self.moment(first).timestamp() if first < len(self) else self.start,
+            self.step,
+        )
+        series.values = self.values[first:last]
+        series.valid = self.valid[first:last]
+        return series
+
+    def window_sums(self, count: int) -> list[float | None]:
+        """Sum of each run of count slots, by first slot.
+
+        None where a slot of the run has no value. A running sum, so all
+        windows take one pass whatever their length.
+        """
+        values, valid = self.values, self.valid
+        sums: list[float | None] = []
+        if count <= 0 or count > len(values):
+            return sums
+        total = math.fsum(values[:count])
+        missing = count - sum(valid[:count])
+        for first in range(len(values) - count + 1):
+            if first:
+                last = first + count - 1
+                total += values[last] - values[first - 1]
+                missing += valid[first - 1] - valid[last]
+            sums.append(None if missing else total)
+        return sums
+
+    def resample(self, step: float, mean: bool = False) -> Series:
+        """Combine every step / self.step slots into one, by sum or mean.
+
+        A combined slot has no value if any of its slots is missing one.
+        """
+        factor = round(step / self.step)
+        if factor < 1 or factor * self.step != step or self.step % DAY == 0:
+            raise ValueError(f"Cannot resample a {self.step} s series to {step} s")
+        series = Series(self.start, step)
+        for first in range(0, len(self), factor):
+            group = slice(first, first + factor)
+            if all(self.valid[group]):
+                total = math.fsum(self.values[group])
+                series.append(total / len(self.valid[group]) if mean else total)
+            else:
+                series.append(None)
+        return series
+
+    def __iter__(self) -> Iterator[tuple[datetime, float | None]]:
+        """Yield the start time and value of every slot."""
+        if not self.values:
+            return iter(())
+        if all(self.valid):
+            return zip(self._moments(), self.values)
+        return zip(self._moments(), self.to_list())
+
+    def to_list(self) -> list[float | None]:
+        return [
+            value if valid else None for value, valid in zip(self.values, self.valid)
+        ]
+
+    def compact(self, convert: Callable[[float], Any]) -> dict[str, Any]:
+        """Render as a start epoch, a step in seconds and a value list."""
+        if not self.values:
+            return {"start": None, "step": self.step, "values": []}
+        return {
+            "start": int(self.start),
+            "step": self.step,
+            "values": [
+                convert(value) if valid else None
+                for value, valid in zip(self.values, self.valid)
+            ],
+        }
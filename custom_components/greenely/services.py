@@ -1,15 +1,19 @@
+import asyncio
 import logging
 import voluptuous as vol
 import json
 import homeassistant.helpers.config_validation as cv
-from homeassistant.components.notify import DOMAIN as NOTIFY_DOMAIN
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.const import CONF_PASSWORD, CONF_EMAIL
 from homeassistant.core import HomeAssistant, ServiceCall
-from .api import GreenelyApi
-from .const import DOMAIN
+from homeassistant.exceptions import HomeAssistantError
+from .const import BACKFILL_SERIES, DOMAIN, SETUP_TIMEOUT
 
 _LOGGER = logging.getLogger(__name__)
 
+# Not imported from the notify component, that would load all of it
+NOTIFY_DOMAIN = "notify"
+
 SERVICE_FETCH_FACILITIES = "fetch_facilities"
 
 SERVICE_FETCH_FACILITIES_SCHEMA = vol.Schema(
@@ -20,17 +24,45 @@ SERVICE_FETCH_FACILITIES_SCHEMA = vol.Schema(
     }
 )
 
+SERVICE_BACKFILL = "backfill"
+
+SERVICE_BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required("start_date"): cv.date,
+        vol.Optional("facility_id"): cv.string,
+        vol.Optional("series", default=["usage"]): vol.All(
+            cv.ensure_list, [vol.In(list(BACKFILL_SERIES))]
+        ),
+    }
+)
+
 
 async def async_setup_services(hass: HomeAssistant) -> None:
     """Set up services for the Greenely integration."""
 
     async def async_fetch_facilities(call: ServiceCall):
         """Service to fetch facility id."""
+        import httpx
+
+        from .api import GreenelyApi, async_get_client, get_rate_limiter
+
         email = call.data[CONF_EMAIL]
         password = call.data[CONF_PASSWORD]
 
-        api = GreenelyApi(email, password)
-        if not api.check_auth():
+        api = GreenelyApi(
+            email,
+            password,
+            await async_get_client(hass),
+            limiter=get_rate_limiter(hass, email),
+        )
+        try:
+            async with asyncio.timeout(SETUP_TIMEOUT):
+                authenticated = await api.ensure_auth()
+                facilityIds = await api.get_facility_ids() if authenticated else None
+        except (TimeoutError, httpx.HTTPError) as err:
+            raise HomeAssistantError(f"Unable to reach Greenely: {err}") from err
+
+        if not authenticated:
             await hass.services.async_call(
                 NOTIFY_DOMAIN,
                 "persistent_notification",
@@ -39,7 +71,6 @@ async def async_setup_services(hass: HomeAssistant) -> None:
             )
 
         else:
-            facilityIds = api.get_facility_ids()
             _LOGGER.info("Facilities fetched successfully")
 
             facilityIdsOutput = []
@@ -65,9 +96,38 @@ async def async_setup_services(hass: HomeAssistant) -> None:
                     blocking=True,
                 )
 
+    async def async_backfill(call: ServiceCall):
+        """Service to import history into long-term statistics."""
+        facilityId = call.data.get("facility_id")
+        started = False
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            if entry.state is not ConfigEntryState.LOADED:
+                continue
+            for coordinator in entry.runtime_data.coordinators:
+                if facilityId and coordinator.api.facility_id != facilityId:
+                    continue
+                # Runs in the background, an unload cancels it and the
+                # stored progress lets the next start continue it
+                entry.async_create_background_task(
+                    hass,
+                    coordinator.backfill.async_start(
+                        call.data["series"], call.data["start_date"]
+                    ),
+                    f"{DOMAIN} backfill {coordinator.api.facility_id}",
+                )
+                started = True
+        if not started:
+            raise HomeAssistantError(f"No Greenely facility {facilityId or ''} loaded")
+
     hass.services.async_register(
         DOMAIN,
         SERVICE_FETCH_FACILITIES,
         async_fetch_facilities,
         schema=SERVICE_FETCH_FACILITIES_SCHEMA,
     )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL,
+        async_backfill,
+        schema=SERVICE_BACKFILL_SCHEMA,
+    )
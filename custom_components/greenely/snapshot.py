@@ -0,0 +1,63 @@
+"""Snapshot of the last fetched data, restored when Home Assistant starts."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, SNAPSHOT_SAVE_DELAY
+
+if TYPE_CHECKING:
+    from .coordinator import GreenelyDataUpdateCoordinator
+
+STORAGE_VERSION = 1
+
+# The series of GreenelyCoordinatorData, the rest is derived from them
+SNAPSHOT_SERIES = ("daily_usage", "hourly_usage", "spot_price", "produced_electricity")
+
+
+class GreenelySnapshot:
+    """The facilities of a config entry and the series last fetched for them.
+
+    Saved after every refresh. At startup the coordinators begin from it so
+    the entities have their last known state before anything is fetched.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot"
+        )
+        self._coordinators: list[GreenelyDataUpdateCoordinator] = []
+        self._facilities: list[str] | None = None
+
+    async def async_load(self) -> dict[str, Any] | None:
+        return await self._store.async_load()
+
+    def async_schedule_save(
+        self, coordinators: list[GreenelyDataUpdateCoordinator]
+    ) -> None:
+        self._coordinators = coordinators
+        self._store.async_delay_save(self._data_to_save, SNAPSHOT_SAVE_DELAY)
+
+    async def async_save_facilities(
+        self,
+        coordinators: list[GreenelyDataUpdateCoordinator],
+        facility_ids: list[str],
+    ) -> None:
+        """Store a changed facility list right away, ahead of a reload."""
+        self._coordinators = coordinators
+        self._facilities = facility_ids
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {
+            "facilities": self._facilities
+            or [str(coordinator.api.facility_id) for coordinator in self._coordinators],
+            "data": {
+                str(coordinator.api.facility_id): coordinator.snapshot()
+                for coordinator in self._coordinators
+                if coordinator.data is not None
+            },
+        }
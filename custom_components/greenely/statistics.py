@@ -0,0 +1,170 @@
+"""Import Greenely history into Home Assistant long-term statistics."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .parsing import Points
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class GreenelyStatistics:
+    """Append hourly series of a facility to external statistics.
+
+    The last imported hour and running sum of each statistic are read from
+    the recorder once and then tracked here, so every cycle only adds the
+    hours that were not imported yet.
+    """
+
+    def __init__(self, hass: HomeAssistant, facility_id: str) -> None:
+        self._hass = hass
+        self._facility_id = facility_id
+        self._last: dict[str, tuple[float | None, float]] = {}
+
+    def statistic_id(self, kind: str) -> str:
+        return f"{DOMAIN}:{self._facility_id}_{kind}"
+
+    async def _async_get_last(self, statistic_id: str) -> tuple[float | None, float]:
+        last = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics, self._hass, 1, statistic_id, True, {"sum"}
+        )
+        if not last.get(statistic_id):
+            return None, 0.0
+        row = last[statistic_id][0]
+        return row["start"], row.get("sum") or 0.0
+
+    async def async_import(
+        self,
+        kind: str,
+        name: str,
+        unit: str,
+        points: Points,
+        has_sum: bool,
+        until: datetime | None = None,
+    ) -> None:
+        """Import the hours in points that follow the last imported one.
+
+        Hours without a value after the last one with a value are not final
+        yet and wait for a later import. Earlier hours without a value are
+        holes that are skipped, the sum continues across them. With has_sum
+        the values are accumulated into an incrementing sum, otherwise they
+        are stored as the hourly mean.
+        """
+        statistic_id = self.statistic_id(kind)
+        if statistic_id not in self._last:
+            self._last[statistic_id] = await self._async_get_last(statistic_id)
+        last_start, total = self._last[statistic_id]
+
+        end = None
+        for moment, value in points:
+            if until is not None and moment > until:
+                break
+            if value is not None:
+                end = moment
+
+        time_zone = dt_util.get_default_time_zone()
+        statistics = []
+        for moment, value in points:
+            if end is None or moment > end:
+                break
+            if value is None:
+                continue
+            start = dt_util.as_utc(moment.replace(tzinfo=time_zone))
+            if last_start is not None and start.timestamp() <= last_start:
+                continue
+            if has_sum:
+                total += value
+                statistics.append(StatisticData(start=start, state=value, sum=total))
+            else:
+                statistics.append(
+                    StatisticData(start=start, mean=value, min=value, max=value)
+                )
+            last_start = start.timestamp()
+
+        self._last[statistic_id] = (last_start, total)
+        if not statistics:
+            return
+
+        _LOGGER.debug("Importing %s hours into %s", len(statistics), statistic_id)
+        self._add(statistic_id, name, unit, has_sum, statistics)
+
+    async def async_sum_before(self, kind: str, moment: datetime) -> float:
+        """Return the sum of a statistic at the hour before moment."""
+        statistic_id = self.statistic_id(kind)
+        end = dt_util.as_utc(moment.replace(tzinfo=dt_util.get_default_time_zone()))
+        rows = await get_instance(self._hass).async_add_executor_job(
+            statistics_during_period,
+            self._hass,
+            end - timedelta(hours=1),
+            end,
+            {statistic_id},
+            "hour",
+            None,
+            {"sum"},
+        )
+        if not rows.get(statistic_id):
+            return 0.0
+        return rows[statistic_id][-1].get("sum") or 0.0
+
+    async def async_backfill(
+        self, kind: str, name: str, unit: str, points: Points, total: float
+    ) -> float:
+        """Import hours of a sum statistic whatever was imported before.
+
+        Rows that already exist are overwritten, so importing a range in
+        order from its start rewrites the sums consistently. Returns the
+        sum after the last imported hour.
+        """
+        statistic_id = self.statistic_id(kind)
+        time_zone = dt_util.get_default_time_zone()
+        statistics = []
+        last_start = None
+        for moment, value in points:
+            # Gaps in old history are skipped rather than ending the import
+            if value is None:
+                continue
+            start = dt_util.as_utc(moment.replace(tzinfo=time_zone))
+            total += value
+            statistics.append(StatisticData(start=start, state=value, sum=total))
+            last_start = start.timestamp()
+        if not statistics:
+            return total
+
+        _LOGGER.debug("Backfilling %s hours into %s", len(statistics), statistic_id)
+        self._add(statistic_id, name, unit, True, statistics)
+        previous = self._last.get(statistic_id)
+        if previous is None or previous[0] is None or last_start >= previous[0]:
+            # Later regular imports continue from the backfilled sum
+            self._last[statistic_id] = (last_start, total)
+        return total
+
+    def _add(
+        self,
+        statistic_id: str,
+        name: str,
+        unit: str,
+        has_sum: bool,
+        statistics: list[StatisticData],
+    ) -> None:
+        metadata = StatisticMetaData(
+            has_mean=not has_sum,
+            has_sum=has_sum,
+            name=name,
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_of_measurement=unit,
+        )
+        async_add_external_statistics(self._hass, metadata, statistics)
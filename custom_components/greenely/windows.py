@@ -0,0 +1,108 @@
+"""Cheapest and most expensive spot price windows."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from .series import Series
+
+
+@dataclass(slots=True)
+class PriceWindow:
+    """A run of consecutive slots and their average price."""
+
+    start: datetime
+    end: datetime
+    average: float
+
+    def contains(self, moment: datetime) -> bool:
+        return self.start <= moment < self.end
+
+
+@dataclass
+class PriceWindowIndex:
+    """Per day windows for each length, plus a percentile rank per slot.
+
+    ``ranks`` is aligned with the series the index was built from, so the
+    series index of the current slot gives its rank directly.
+    """
+
+    cheapest: dict[date, dict[int, PriceWindow]] = field(default_factory=dict)
+    most_expensive: dict[date, dict[int, PriceWindow]] = field(default_factory=dict)
+    ranks: list[float | None] = field(default_factory=list)
+
+
+def build_window_index(series: Series, hours: list[int]) -> PriceWindowIndex:
+    """Index the cheapest and most expensive windows of each day.
+
+    The window sums of each length come from one running sum over the
+    whole series, and the ranks from one sort per day, so the whole index
+    is built in O(n log n) once per fetch.
+    """
+    index = PriceWindowIndex(ranks=[None] * len(series))
+    days: dict[date, list[int]] = {}
+    for position, valid in enumerate(series.valid):
+        if valid:
+            days.setdefault(series.moment(position).date(), []).append(position)
+
+    values = series.values
+    for day, positions in days.items():
+        prices = sorted(values[position] for position in positions)
+        last = max(len(prices) - 1, 1)
+        for position in positions:
+            index.ranks[position] = round(
+                100 * bisect_left(prices, values[position]) / last
+            )
+
+    slot = timedelta(seconds=series.step)
+    for length in hours:
+        slots = int(length * 3600 // series.step)
+        if slots <= 0:
+            continue
+        sums = series.window_sums(slots)
+        for day, positions in days.items():
+            cheapest, most_expensive = _extreme_windows(
+                series, sums, positions, slots, slot
+            )
+            if cheapest is not None:
+                index.cheapest.setdefault(day, {})[length] = cheapest
+                index.most_expensive.setdefault(day, {})[length] = most_expensive
+    return index
+
+
+def _extreme_windows(
+    series: Series,
+    sums: list[float | None],
+    positions: list[int],
+    slots: int,
+    slot: timedelta,
+) -> tuple[PriceWindow | None, PriceWindow | None]:
+    lowest = highest = None
+    # Windows that end the same day, a sum only exists without gaps
+    for first in range(positions[0], positions[-1] - slots + 2):
+        total = sums[first]
+        if total is None:
+            continue
+        if lowest is None or total < lowest[0]:
+            lowest = (total, first)
+        if highest is None or total > highest[0]:
+            highest = (total, first)
+
+    if lowest is None:
+        return None, None
+    return (
+        _window(series, *lowest, slots, slot),
+        _window(series, *highest, slots, slot),
+    )
+
+
+def _window(
+    series: Series, total: float, first: int, slots: int, slot: timedelta
+) -> PriceWindow:
+    return PriceWindow(
+        start=series.moment(first),
+        end=series.moment(first + slots - 1) + slot,
+        average=total / slots,
+    )
@@ -0,0 +1,74 @@
+"""Tests of GreenelyApi against the local mock API."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely.api import GreenelyApi  # noqa: E402
+from mock_server import MockGreenelyServer  # noqa: E402
+
+
+def run_api(server: MockGreenelyServer, calls, facility_id=None):
+    async def _run():
+        async with httpx.AsyncClient() as client:
+            api = GreenelyApi(
+                "user@example.com", "secret", client, base_url=server.base_url
+            )
+            if facility_id is not None:
+                api.set_facility_id(facility_id)
+            return await calls(api)
+
+    return asyncio.run(_run())
+
+
+def test_primary_facility_resolved_once():
+    async def calls(api):
+        assert await api.ensure_auth()
+        await api.get_spot_price()
+        assert await api.ensure_auth()
+        return api.facility_id
+
+    with MockGreenelyServer(facilities=2) as server:
+        assert run_api(server, calls) == "1000"
+        assert server.requests["login"] == 1
+        assert server.requests["facilities"] == 1
+
+
+def test_facility_lookup_keeps_chosen_facility():
+    async def calls(api):
+        assert await api.ensure_auth()
+        return await api.get_facility_id(), api.facility_id
+
+    with MockGreenelyServer(facilities=2) as server:
+        assert run_api(server, calls, 1001) == ("1000", "1001")
+
+
+def test_primary_facility_not_listed_first():
+    async def calls(api):
+        assert await api.ensure_auth()
+        return await api.get_facility_id(), api.facility_id
+
+    with MockGreenelyServer(facilities=3, primary=2) as server:
+        assert run_api(server, calls) == ("1002", "1002")
+
+
+def test_concurrent_callers_share_login_and_facility_lookup():
+    async def calls(api):
+        results = await asyncio.gather(*(api.ensure_auth() for _ in range(5)))
+        return all(results), api.facility_id
+
+    with MockGreenelyServer(facilities=2) as server:
+        assert run_api(server, calls) == (True, "1000")
+        assert server.requests["login"] == 1
+        assert server.requests["facilities"] == 1
@@ -0,0 +1,89 @@
+"""Tests of the resumable history backfill."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely import backfill  # noqa: E402
+
+
+class MemoryStore:
+    def __init__(self, hass, version, key) -> None:
+        self.data = None
+
+    async def async_load(self):
+        return self.data
+
+    async def async_save(self, data) -> None:
+        self.data = data
+
+
+class BlockingApi:
+    """Answers usage requests with no points once released."""
+
+    facility_id = "1000"
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.starts: list[date] = []
+
+    async def get_usage(self, start, end, hourly, priority):
+        self.starts.append(start)
+        await self.release.wait()
+        return {}
+
+
+class RecordingStatistics:
+    def __init__(self) -> None:
+        self.chunks = 0
+
+    async def async_sum_before(self, series, moment):
+        return 0.0
+
+    async def async_backfill(self, series, name, unit, points, total):
+        self.chunks += 1
+        return total
+
+
+def test_month_chunks_split_at_month_boundaries():
+    assert backfill.month_chunks(date(2024, 1, 20), date(2024, 3, 5)) == [
+        (date(2024, 1, 20), date(2024, 2, 1)),
+        (date(2024, 2, 1), date(2024, 3, 1)),
+        (date(2024, 3, 1), date(2024, 3, 5)),
+    ]
+
+
+def test_start_while_running_is_not_dropped(monkeypatch):
+    monkeypatch.setattr(backfill, "Store", MemoryStore)
+    today = date.today()
+    first_start = today - timedelta(days=1)
+    second_start = today.replace(day=1) - timedelta(days=40)
+
+    async def run():
+        api = BlockingApi()
+        statistics = RecordingStatistics()
+        job = backfill.GreenelyBackfill(None, api, statistics)
+        first = asyncio.create_task(job.async_start(["usage"], first_start))
+        while not api.starts:
+            await asyncio.sleep(0)
+        second = asyncio.create_task(job.async_start(["usage"], second_start))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        api.release.set()
+        await asyncio.gather(first, second)
+        return api.starts, job._jobs
+
+    starts, jobs = asyncio.run(run())
+    assert starts[0] == first_start
+    assert second_start in starts
+    assert jobs == {}
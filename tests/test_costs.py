@@ -0,0 +1,121 @@
+"""Tests of the local cost computation."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely.costs import CostEngine  # noqa: E402
+
+HOUR = datetime(2024, 5, 10, 13)
+
+
+@pytest.mark.parametrize(
+    ("used", "price", "fee", "markup", "cost"),
+    [
+        # Wh, 1/100000 SEK per kWh, SEK per kWh, percent, SEK
+        (1000, 100000, 0.0, 0.0, 1.0),
+        (2500, 50000, 0.1, 0.0, 1.5),
+        (1000, 100000, 0.0, 25.0, 1.25),
+        (500, 200000, 0.2, 10.0, 1.2),
+        (1000, -20000, 0.5, 0.0, 0.3),
+        (0, 100000, 0.5, 0.0, 0.0),
+    ],
+)
+def test_hour_cost_units(used, price, fee, markup, cost):
+    engine = CostEngine(fee, markup)
+    engine.update([(HOUR, used)], [(HOUR, price)])
+    assert engine.day_total(HOUR.date()) == pytest.approx(cost)
+
+
+def test_quarter_hour_prices_are_averaged():
+    engine = CostEngine(0.0, 0.0)
+    prices = [
+        (HOUR + timedelta(minutes=15 * quarter), price)
+        for quarter, price in enumerate((50000, 100000, 150000, 100000))
+    ]
+    engine.update([(HOUR, 1000)], prices)
+    assert engine.day_total(HOUR.date()) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    ("usage", "prices"),
+    [
+        ([(HOUR, None)], [(HOUR, 100000)]),
+        ([(HOUR, 1000)], [(HOUR, None)]),
+        ([(HOUR, 1000)], [(HOUR + timedelta(hours=1), 100000)]),
+        (
+            [(HOUR, 1000)],
+            [(HOUR, 100000), (HOUR + timedelta(minutes=15), None)],
+        ),
+    ],
+)
+def test_hours_without_usage_or_price_are_skipped(usage, prices):
+    engine = CostEngine(0.5, 0.0)
+    engine.update(usage, prices)
+    assert engine.day_total(HOUR.date()) is None
+
+
+def test_changed_hour_replaces_its_cost():
+    engine = CostEngine(0.0, 0.0)
+    other = HOUR + timedelta(hours=1)
+    engine.update([(HOUR, 1000), (other, 1000)], [(HOUR, 100000), (other, 100000)])
+    engine.update([(HOUR, 3000)], [(HOUR, 100000)])
+    engine.update([(other, 1000)], [(other, 200000)])
+    assert engine.day_total(HOUR.date()) == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize(
+    ("remote", "cutoff", "total"),
+    [
+        # Local days 1 to 5 cost 1.0 each, remote costs in 1/100000 SEK
+        ({}, date(2024, 5, 4), 5.0),
+        # Reported days before the cutoff win
+        ({1: 200000, 2: 200000, 4: 200000}, date(2024, 5, 4), 7.0),
+        # From the cutoff on the local total wins
+        ({4: 200000, 5: 200000}, date(2024, 5, 4), 5.0),
+        # A reported day without a local total is always counted
+        ({3: 200000, 6: 300000}, date(2024, 5, 4), 6.0 + 3.0),
+        ({3: None}, date(2024, 5, 4), 5.0),
+    ],
+)
+def test_month_total_prefers_reported_days_before_cutoff(remote, cutoff, total):
+    engine = CostEngine(0.0, 0.0)
+    hours = [datetime(2024, 5, day, 12) for day in range(1, 6)]
+    # Not part of May
+    hours.append(datetime(2024, 4, 30, 12))
+    engine.update([(hour, 1000) for hour in hours], [(hour, 100000) for hour in hours])
+    engine.reconcile(
+        {
+            str(index): {"localtime": f"2024-05-{day:02d} 00:00", "cost": cost}
+            for index, (day, cost) in enumerate(remote.items())
+        }
+    )
+    assert engine.month_total(date(2024, 5, 6), cutoff) == pytest.approx(total)
+
+
+def test_month_total_leaves_out_days_after_today():
+    engine = CostEngine(0.0, 0.0)
+    hours = [datetime(2024, 5, day, 12) for day in range(1, 6)]
+    engine.update([(hour, 1000) for hour in hours], [(hour, 100000) for hour in hours])
+    engine.reconcile({"0": {"localtime": "2024-05-06 00:00", "cost": 500000}})
+    assert engine.month_total(date(2024, 5, 2), date(2024, 5, 2)) == pytest.approx(2.0)
+
+
+def test_prune_forgets_older_days():
+    engine = CostEngine(0.0, 0.0)
+    old, new = datetime(2024, 4, 30, 12), datetime(2024, 5, 1, 12)
+    engine.update([(old, 1000), (new, 1000)], [(old, 100000), (new, 100000)])
+    engine.reconcile({"0": {"localtime": "2024-04-30 00:00", "cost": 100000}})
+    engine.prune(date(2024, 5, 1))
+    assert engine.day_total(old.date()) is None
+    assert engine.day_total(new.date()) == pytest.approx(1.0)
+    assert engine.month_total(date(2024, 4, 30), date(2024, 5, 1)) == 0.0
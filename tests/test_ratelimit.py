@@ -0,0 +1,127 @@
+"""Tests of the request budget, on a fake clock."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely import ratelimit  # noqa: E402
+from custom_components.greenely.const import (  # noqa: E402
+    PRIORITY_BACKFILL,
+    PRIORITY_DEFAULT,
+    PRIORITY_PRICES,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_RESERVE,
+)
+
+# One request per second
+BUDGET = 3600
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only the limiter's clock, the event loop keeps the real one
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    async def run():
+        limiter = ratelimit.RateLimiter(BUDGET)
+        assert limiter.as_dict()["remaining"] == RATE_LIMIT_BURST
+        for _ in range(RATE_LIMIT_BURST):
+            await limiter.acquire(PRIORITY_DEFAULT)
+        remaining = [limiter.as_dict()["remaining"]]
+        clock.now += 5
+        remaining.append(limiter.as_dict()["remaining"])
+        clock.now += 3600
+        remaining.append(limiter.as_dict()["remaining"])
+        limiter.configure(10)
+        remaining.append(limiter.as_dict()["remaining"])
+        return remaining, limiter.as_dict()
+
+    remaining, state = asyncio.run(run())
+    assert remaining == [0, 5, RATE_LIMIT_BURST, 10]
+    assert state["capacity"] == 10
+    assert state["granted"] == RATE_LIMIT_BURST
+
+
+def test_waiting_requests_served_by_priority(clock):
+    async def run():
+        limiter = ratelimit.RateLimiter(BUDGET)
+        for _ in range(RATE_LIMIT_BURST):
+            await limiter.acquire(PRIORITY_DEFAULT)
+        served: list[int] = []
+
+        async def request(priority):
+            await limiter.acquire(priority)
+            served.append(priority)
+
+        tasks = [
+            asyncio.create_task(request(priority))
+            for priority in (PRIORITY_BACKFILL, PRIORITY_DEFAULT, PRIORITY_PRICES)
+        ]
+        await settle()
+        assert served == []
+        for _ in range(10):
+            clock.now += 1
+            limiter._notify()
+            await settle()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(run()) == [PRIORITY_PRICES, PRIORITY_DEFAULT, PRIORITY_BACKFILL]
+
+
+def test_backfill_leaves_a_reserve(clock):
+    async def run():
+        limiter = ratelimit.RateLimiter(BUDGET)
+        granted = 0
+        while True:
+            try:
+                await asyncio.wait_for(limiter.acquire(PRIORITY_BACKFILL), 0.01)
+            except TimeoutError:
+                break
+            granted += 1
+        reserve = limiter.as_dict()
+        await limiter.acquire(PRIORITY_PRICES)
+        return granted, reserve, limiter.as_dict()
+
+    granted, reserve, after = asyncio.run(run())
+    reserved = RATE_LIMIT_BURST * RATE_LIMIT_RESERVE
+    assert granted == RATE_LIMIT_BURST - reserved
+    assert reserve["remaining"] == reserved
+    assert reserve["waiting"] == 0
+    assert after["remaining"] == reserved - 1
+
+
+def test_backfill_with_tiny_budget_still_gets_a_full_bucket(clock):
+    async def run():
+        limiter = ratelimit.RateLimiter(1)
+        await asyncio.wait_for(limiter.acquire(PRIORITY_BACKFILL), 0.01)
+        return limiter.as_dict()
+
+    assert asyncio.run(run())["granted"] == 1
@@ -0,0 +1,128 @@
+"""Tests of the circuit breaker, on a fake clock."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely import resilience  # noqa: E402
+from custom_components.greenely.const import (  # noqa: E402
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_OPEN_MAX,
+    BREAKER_OPEN_MIN,
+)
+from custom_components.greenely.resilience import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        resilience, "time", SimpleNamespace(monotonic=clock, time=clock)
+    )
+    return clock
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        breaker.before_call()
+        breaker.failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.before_call()
+        breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_open_half_open_closed(clock):
+    breaker = open_breaker()
+    clock.now += BREAKER_OPEN_MIN - 1
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    # Only the probe goes through
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_probe_doubles_open_period(clock):
+    breaker = open_breaker()
+    periods = []
+    open_for = BREAKER_OPEN_MIN
+    while len(periods) < 7:
+        clock.now += open_for
+        breaker.before_call()
+        breaker.failure()
+        opened = clock.now
+        while breaker.state == "open":
+            clock.now += 1
+        open_for = clock.now - opened
+        periods.append(open_for)
+    assert periods == [
+        min(BREAKER_OPEN_MIN * 2**attempt, BREAKER_OPEN_MAX) for attempt in range(1, 8)
+    ]
+    breaker.before_call()
+    breaker.success()
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        breaker.failure()
+    clock.now += BREAKER_OPEN_MIN
+    assert breaker.state == "half_open"
+
+
+def test_retry_after_opens_at_once(clock):
+    breaker = CircuitBreaker()
+    breaker.failure(open_for=300)
+    assert breaker.state == "open"
+    clock.now += 299
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half_open"
+
+
+def test_retry_after_is_capped(clock):
+    breaker = CircuitBreaker()
+    breaker.failure(open_for=BREAKER_OPEN_MAX * 10)
+    clock.now += BREAKER_OPEN_MAX
+    assert breaker.state == "half_open"
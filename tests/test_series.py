@@ -0,0 +1,185 @@
+"""Tests of the array backed Series."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+import time
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely.parsing import DateTimeFormatter  # noqa: E402
+from custom_components.greenely.series import DAY, HOUR, Series  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def stockholm(monkeypatch):
+    """Local time with DST changes, on 2024-03-31 and 2024-10-27."""
+    monkeypatch.setenv("TZ", "Europe/Stockholm")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def hourly(start: datetime, values) -> Series:
+    series = Series(start.timestamp(), HOUR)
+    for value in values:
+        series.append(value)
+    return series
+
+
+def test_append_gap_adds_invalid_slots():
+    series = hourly(datetime(2024, 1, 1), [1.0])
+    series.append_gap(2)
+    series.append(4.0)
+    series.append_gap(0)
+    assert series.to_list() == [1.0, None, None, 4.0]
+    assert len(series) == 4
+
+
+def test_from_points_marks_missing_slots():
+    start = datetime(2024, 1, 1)
+    points = [
+        (start, 1.0),
+        (start + timedelta(hours=1), None),
+        (start + timedelta(hours=3), 4.0),
+    ]
+    series = Series.from_points(points, HOUR)
+    assert series.to_list() == [1.0, None, None, 4.0]
+    assert Series.from_points([], HOUR).to_list() == []
+
+
+def test_from_points_keeps_repeated_hour_when_dst_ends():
+    day = datetime(2024, 10, 27)
+    hours = [day + timedelta(hours=hour) for hour in range(24)]
+    # 02:00 happens twice, the API lists both
+    points = [(moment, float(index)) for index, moment in enumerate(hours)]
+    points.insert(3, (hours[2], 2.5))
+    series = Series.from_points(points, HOUR)
+    assert len(series) == 25
+    assert series.value(3) == 2.5
+    assert series.moment(24) == datetime(2024, 10, 27, 23)
+
+
+def test_from_response_matches_from_points():
+    response = {
+        str(index): {
+            "localtime": f"2024-03-31 {hour:02d}:00",
+            "usage": None if hour == 5 else hour * 10,
+        }
+        for index, hour in enumerate(hour for hour in range(24) if hour != 2)
+    }
+    series = Series.from_response(response, "usage", HOUR)
+    assert len(series) == 23
+    assert series.moment(2) == datetime(2024, 3, 31, 3)
+    assert series.value(4) is None
+    assert series.value(22) == 230
+
+
+@pytest.mark.parametrize(
+    ("moment", "index"),
+    [
+        (datetime(2024, 1, 1, 0, 0), 0),
+        (datetime(2024, 1, 1, 0, 59), 0),
+        (datetime(2024, 1, 1, 2, 30), 2),
+        (datetime(2024, 1, 1, 23, 59), 23),
+        (datetime(2024, 1, 2, 0, 0), None),
+        (datetime(2023, 12, 31, 23, 59), None),
+    ],
+)
+def test_index_at(moment, index):
+    series = hourly(datetime(2024, 1, 1), range(24))
+    assert series.index_at(moment) == index
+
+
+def test_index_at_daily_series_across_dst():
+    series = Series(datetime(2024, 3, 30).timestamp(), DAY)
+    for value in (1.0, 2.0, 3.0):
+        series.append(value)
+    # 2024-03-31 has 23 hours, the next day still starts a slot
+    assert series.index_at(datetime(2024, 4, 1, 0, 30)) == 2
+    assert series.value_at(datetime(2024, 3, 31, 23, 59)) == 2.0
+    assert series.moment(2) == datetime(2024, 4, 1)
+
+
+def test_value_at_empty_series():
+    assert Series(0.0, HOUR).value_at(datetime(2024, 1, 1)) is None
+
+
+def test_slice():
+    series = hourly(datetime(2024, 1, 1), range(48))
+    day = series.slice(datetime(2024, 1, 2), datetime(2024, 1, 3))
+    assert day.to_list() == list(range(24, 48))
+    assert day.moment(0) == datetime(2024, 1, 2)
+    outside = series.slice(datetime(2024, 2, 1), datetime(2024, 2, 2))
+    assert outside.to_list() == []
+    clipped = series.slice(datetime(2023, 12, 31), datetime(2024, 1, 1, 2))
+    assert clipped.to_list() == [0, 1]
+
+
+def test_slice_of_a_day_with_dst_change():
+    series = hourly(datetime(2024, 10, 27), range(30))
+    day = series.slice(datetime(2024, 10, 27), datetime(2024, 10, 28))
+    assert len(day) == 25
+
+
+def test_resample_by_mean_and_sum():
+    series = Series(datetime(2024, 1, 1).timestamp(), 15 * 60)
+    for value in [1, 2, 3, 4, 5, 6, 7, None]:
+        series.append(value)
+    assert series.resample(HOUR, mean=True).to_list() == [2.5, None]
+    assert series.resample(HOUR).to_list() == [10, None]
+    assert series.resample(HOUR).step == HOUR
+
+
+@pytest.mark.parametrize("step", [HOUR + 1, 60, 1350])
+def test_resample_rejects_other_steps(step):
+    series = Series(datetime(2024, 1, 1).timestamp(), 15 * 60)
+    with pytest.raises(ValueError):
+        series.resample(step)
+
+
+def test_window_sums():
+    series = hourly(datetime(2024, 1, 1), [1, 2, None, 4, 5, 6])
+    assert series.window_sums(2) == [3, None, None, 9, 11]
+    assert series.window_sums(6) == [None]
+    assert series.window_sums(7) == []
+    assert series.window_sums(0) == []
+
+
+def test_dict_round_trip():
+    series = hourly(datetime(2024, 1, 1), [1.5, None, 3.0])
+    stored = series.as_dict()
+    assert stored == {"start": series.start, "step": HOUR, "values": [1.5, None, 3.0]}
+    assert Series.from_dict(stored) == series
+    assert Series.from_dict(Series(0.0, DAY).as_dict()) == Series(0.0, DAY)
+
+
+def test_iteration_and_labels_across_dst():
+    formatter = DateTimeFormatter("%Y-%m-%d", "%H:%M")
+    series = hourly(datetime(2024, 10, 26, 22), range(8))
+    moments = [moment for moment, _ in series]
+    assert moments == [
+        datetime.fromtimestamp(series.start + index * HOUR) for index in range(8)
+    ]
+    assert [moment.fold for moment in moments] == [0, 0, 0, 0, 0, 1, 0, 0]
+    assert list(series.labels(formatter)) == [
+        (formatter.date(moment), formatter.time(moment)) for moment in moments
+    ]
+    assert [value for _, value in series] == list(range(8))
+
+
+def test_compact():
+    series = hourly(datetime(2024, 1, 1), [1000.0, None])
+    assert series.compact(lambda value: value / 1000) == {
+        "start": int(series.start),
+        "step": HOUR,
+        "values": [1.0, None],
+    }
@@ -0,0 +1,146 @@
+"""Tests of the price window index."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+import sys
+import time
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("homeassistant")
+
+from custom_components.greenely.series import HOUR, Series  # noqa: E402
+from custom_components.greenely.windows import build_window_index  # noqa: E402
+
+QUARTER = 15 * 60
+
+
+@pytest.fixture(autouse=True)
+def stockholm(monkeypatch):
+    """Local time with DST changes, on 2024-03-31 and 2024-10-27."""
+    monkeypatch.setenv("TZ", "Europe/Stockholm")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def day_series(day: datetime, step: float, count: int, lowest: int) -> Series:
+    """Prices rising on both sides of the slot at position lowest."""
+    series = Series(day.timestamp(), step)
+    for position in range(count):
+        series.append(float(abs(position - lowest)))
+    return series
+
+
+# day, step, slots, cheapest position, window hours,
+# cheapest (start, end, average), most expensive (start, end, average)
+CASES = [
+    pytest.param(
+        datetime(2024, 3, 31),
+        HOUR,
+        23,
+        2,
+        3,
+        (datetime(2024, 3, 31, 1), datetime(2024, 3, 31, 5), 2 / 3),
+        (datetime(2024, 3, 31, 21), datetime(2024, 4, 1), 19),
+        id="23 slots",
+    ),
+    pytest.param(
+        datetime(2024, 10, 27),
+        HOUR,
+        25,
+        3,
+        3,
+        (datetime(2024, 10, 27, 2), datetime(2024, 10, 27, 4), 2 / 3),
+        (datetime(2024, 10, 27, 21), datetime(2024, 10, 28), 20),
+        id="25 slots",
+    ),
+    pytest.param(
+        datetime(2024, 1, 15),
+        QUARTER,
+        96,
+        40,
+        1,
+        (datetime(2024, 1, 15, 9, 30), datetime(2024, 1, 15, 10, 30), 1),
+        (datetime(2024, 1, 15, 23), datetime(2024, 1, 16), 53.5),
+        id="96 slots",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    ("day", "step", "count", "lowest", "hours", "cheapest", "most_expensive"),
+    CASES,
+)
+def test_windows(day, step, count, lowest, hours, cheapest, most_expensive):
+    index = build_window_index(day_series(day, step, count, lowest), [hours])
+    window = index.cheapest[day.date()][hours]
+    assert (window.start, window.end) == cheapest[:2]
+    assert window.average == pytest.approx(cheapest[2])
+    window = index.most_expensive[day.date()][hours]
+    assert (window.start, window.end) == most_expensive[:2]
+    assert window.average == pytest.approx(most_expensive[2])
+
+
+@pytest.mark.parametrize(
+    ("day", "step", "count", "lowest", "hours", "cheapest", "most_expensive"),
+    CASES,
+)
+def test_ranks(day, step, count, lowest, hours, cheapest, most_expensive):
+    series = day_series(day, step, count, lowest)
+    ranks = build_window_index(series, [hours]).ranks
+    assert len(ranks) == count
+    assert ranks[lowest] == 0
+    assert ranks[series.values.index(max(series.values))] == 100
+    assert all(0 <= rank <= 100 for rank in ranks)
+
+
+@pytest.mark.parametrize(
+    ("day", "step", "count", "windows"),
+    [
+        (datetime(2024, 3, 31), HOUR, 23, 0),
+        (datetime(2024, 10, 27), HOUR, 25, 1),
+        (datetime(2024, 1, 15), QUARTER, 96, 1),
+    ],
+)
+def test_whole_day_window(day, step, count, windows):
+    index = build_window_index(day_series(day, step, count, 0), [24])
+    assert len(index.cheapest.get(day.date(), {})) == windows
+
+
+def test_percentile_of_distinct_prices():
+    series = Series(datetime(2024, 3, 31).timestamp(), HOUR)
+    for position in range(23):
+        series.append(float(position))
+    ranks = build_window_index(series, []).ranks
+    assert ranks == [round(100 * position / 22) for position in range(23)]
+
+
+def test_windows_stay_within_their_day():
+    day = datetime(2024, 1, 15)
+    series = Series(day.timestamp(), HOUR)
+    # Cheapest across midnight, but each day only sees its own hours
+    for price in [0.0] * 2 + [5.0] * 20 + [0.0] * 2 + [0.0] * 2 + [5.0] * 22:
+        series.append(price)
+    index = build_window_index(series, [4])
+    assert index.cheapest[day.date()][4].end <= datetime(2024, 1, 16)
+    assert index.cheapest[datetime(2024, 1, 16).date()][4].start >= datetime(
+        2024, 1, 16
+    )
+
+
+def test_gaps_break_windows():
+    day = datetime(2024, 1, 15)
+    series = Series(day.timestamp(), HOUR)
+    for position in range(24):
+        series.append(None if position % 2 else 1.0)
+    index = build_window_index(series, [1, 2])
+    assert 1 in index.cheapest[day.date()]
+    assert 2 not in index.cheapest.get(day.date(), {})
+    assert index.ranks[1] is None